@@ -0,0 +1,156 @@
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from collections import defaultdict
+
+from cov_cache import CoverageCache
+from cov_gen import generate, generate_vdb
+from vcs_cg import vcs_cg, merge, parse_cached
+
+# 各解析模式在独立子进程中运行，保证峰值RSS互不影响
+MODES = ('dom', 'stream', 'dom_gz', 'stream_gz', 'cache', 'merge')
+
+def run_mode(mode, path, workers=None, cache_dir=None):
+    start = time.perf_counter()
+    if mode in ('dom', 'dom_gz'):
+        cg = vcs_cg()
+        cg.parse(path)
+    elif mode in ('stream', 'stream_gz'):
+        cg = vcs_cg()
+        cg.parse(path, stream=True)
+    elif mode == 'cache':
+        cg = parse_cached(path, CoverageCache(cache_dir))
+    elif mode == 'merge':
+        cg = merge(path, workers=workers)
+    else:
+        raise Exception('Unsupport mode:' + mode)
+    parse_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    cg.get_missed_cg_cp()
+    cg.get_missed_cg_cc()
+    holes = sum(len(list(bins)) for bins in cg.missed_cg_cp.values())
+    holes += sum(len(cross) for cross in cg.missed_cg_cc.values())
+    hole_time = time.perf_counter() - start
+
+    bins = sum(len(hit) for hit in cg.cp_hit_data.values())
+    return {
+        'mode': mode,
+        'bins': bins,
+        'holes': holes,
+        'parse_s': parse_time,
+        'holes_s': hole_time,
+        'bins_per_s': bins / parse_time if parse_time else 0,
+        'holes_per_s': holes / hole_time if hole_time else 0,
+        # Linux下ru_maxrss单位为KB
+        'peak_rss_mb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    }
+
+def run_child(mode, path, workers=None, cache_dir=None):
+    cmd = [sys.executable, os.path.abspath(__file__), '--child', mode, path]
+    if workers:
+        cmd += ['-j', str(workers)]
+    if cache_dir:
+        cmd += ['--cache-dir', cache_dir]
+    out = subprocess.run(cmd, check=True, stdout=subprocess.PIPE, text=True).stdout
+    return json.loads(out.splitlines()[-1])
+
+def legacy_model(cg):
+    # 旧数据模型：每个bin一个dict，按exprname放在defaultdict的列表里
+    data = defaultdict(str)
+    for exprname, hit in cg.cp_hit_data.items():
+        excl = hit.excl if hit.excl is not None else [False] * len(hit)
+        data[exprname] = [{'val': str(b), 'type': hit.type, 'data': int(h), 'excl': bool(e)}
+                          for b, h, e in zip(hit.bins, hit.hits, excl)]
+    return data
+
+def measure(build):
+    tracemalloc.start()
+    base = tracemalloc.get_traced_memory()[0]
+    obj = build()
+    retained = tracemalloc.get_traced_memory()[0] - base
+    tracemalloc.stop()
+    return obj, retained
+
+def bench_memory(file, n_bins):
+    # 对比新旧数据模型每个bin占用的内存
+    def parse():
+        cg = vcs_cg()
+        cg.parse(file, stream=True)
+        return cg
+
+    cg, after = measure(parse)
+    _, before = measure(lambda: legacy_model(cg))
+    print(f"legacy dict-per-bin: {before / n_bins:.1f} bytes/bin")
+    print(f"CpHits columns:      {after / n_bins:.1f} bytes/bin")
+
+def main():
+    parser = argparse.ArgumentParser(description="vcs_cg解析性能基准测试")
+    parser.add_argument('--user', type=int, default=1000, help='user cp个数')
+    parser.add_argument('--auto', type=int, default=100, help='auto_c cp个数')
+    parser.add_argument('--user-bins', type=int, default=16, help='每个user cp的bin数')
+    parser.add_argument('--auto-bins', type=int, default=10000, help='每个auto_c cp的bin数')
+    parser.add_argument('--cross', type=int, default=100, help='cc个数')
+    parser.add_argument('--arity', type=int, default=2, help='每个cc交叉的cp个数')
+    parser.add_argument('--density', type=float, default=0.5, help='bin命中比例')
+    parser.add_argument('--tests', type=int, default=8, help='merge模式的test个数')
+    parser.add_argument('--modes', default=','.join(MODES), help='逗号分隔的解析模式')
+    parser.add_argument('-j', '--workers', type=int, default=None, help='merge模式的并行进程数')
+    parser.add_argument('--memory', action='store_true', help='只对比新旧数据模型每个bin的内存占用')
+    parser.add_argument('--json', default=None, help='结果按JSON lines追加写入该文件')
+    parser.add_argument('--child', nargs=2, metavar=('MODE', 'PATH'), help=argparse.SUPPRESS)
+    parser.add_argument('--cache-dir', default=None, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(run_mode(args.child[0], args.child[1], args.workers, args.cache_dir)))
+        return
+
+    kwargs = dict(n_user=args.user, n_auto=args.auto, user_bins=args.user_bins, auto_bins=args.auto_bins,
+                  n_cross=args.cross, cross_arity=args.arity, density=args.density)
+    modes = args.modes.split(',')
+    with tempfile.TemporaryDirectory() as tmp:
+        file = os.path.join(tmp, 'testbench.cumulative.xml')
+        n_bins, n_cross = generate(file, **kwargs)
+        print(f"bins:{n_bins},cross combinations:{n_cross}")
+
+        if args.memory:
+            bench_memory(file, n_bins)
+            return
+
+        results = list()
+        for mode in modes:
+            path = file
+            cache_dir = None
+            if mode.endswith('_gz'):
+                path = file + '.gz'
+                if not os.path.exists(path):
+                    generate(path, gz=True, **kwargs)
+            elif mode == 'cache':
+                # 先跑一次写入缓存，第二次的结果才是缓存命中的耗时
+                cache_dir = os.path.join(tmp, 'cache')
+                run_child(mode, path, cache_dir=cache_dir)
+            elif mode == 'merge':
+                path = os.path.join(tmp, 'simv.vdb')
+                if not os.path.exists(path):
+                    generate_vdb(path, n_tests=args.tests, **kwargs)
+            results.append(run_child(mode, path, args.workers, cache_dir))
+
+    print(f"{'mode':<10} {'parse_s':>9} {'bins/s':>12} {'holes_s':>9} {'holes/s':>12} {'peak_rss_mb':>12}")
+    for r in results:
+        print(f"{r['mode']:<10} {r['parse_s']:>9.3f} {r['bins_per_s']:>12.0f} {r['holes_s']:>9.3f} "
+              f"{r['holes_per_s']:>12.0f} {r['peak_rss_mb']:>12.1f}")
+
+    if args.json:
+        with open(args.json, 'a') as f:
+            for r in results:
+                f.write(json.dumps(dict(r, params=kwargs)) + '\n')
+
+if __name__ == '__main__':
+    main()
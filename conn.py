@@ -1,17 +1,223 @@
+import os
+import re
+import threading
 import pandas as pd
 import dash
+import flask
 from dash import dcc, html, dash_table
 from dash.dependencies import Input, Output, State
 
-# 读取初始的 CSV 文件
-df = pd.read_csv('connections.csv')
+import perf
+from conn_graph import ConnGraph
+from conn_index import ConnIndex
+from conn_review import ReviewDB, ReviewJournal
+from conn_store import ConnStore, KEY_COLUMNS, conn_ids
 
-# 确保 'Reviewed' 列存在于初始 DataFrame 中
-if 'Reviewed' not in df.columns:
-    df['Reviewed'] = False
+CSV_PATH = 'connections.csv'
+# CONN_WATCH=1 时监视 CSV，重新生成后只把变化的连接应用到存储和索引，无需重启
+WATCH = os.environ.get('CONN_WATCH', '0') not in ('', '0')
+
+# 打开连接数据，首次启动时把 CSV 转换为列式存储，之后只读取元数据，列按需加载
+with perf.phase('conn.load', csv=CSV_PATH) as p:
+    store = ConnStore(CSV_PATH, watch=WATCH)
+    p.count('rows', len(store))
+reload_lock = threading.Lock()
+
+# 四个信号列的倒排索引，下拉框筛选和候选值搜索都走索引；第一次筛选或搜索时再构建
+index = None
+
+def get_index():
+    global index
+    if index is None:
+        with reload_lock:
+            if index is None:
+                with perf.phase('conn.index_build') as p:
+                    index = ConnIndex(store)
+                    p.count('rows', len(store))
+    return index
+
+# 连接关系图，第一次查询时再构建
+graph = None
+
+def get_graph():
+    global graph
+    if graph is None:
+        with perf.phase('conn.graph_build') as p:
+            graph = ConnGraph(store.frame(KEY_COLUMNS))
+            p.count('nodes', len(graph))
+    return graph
+
+def reload_connections():
+    # CSV 有变化时返回增量，没有变化返回 None；审核状态按连接 ID 保存，未变化的连接自动保留
+    global index, graph
+    with reload_lock, perf.phase('conn.reload') as p:
+        diff = store.poll()
+        if diff is None:
+            return None
+        p.count('rows_added', len(diff.get('added', ())))
+        p.count('rows_removed', len(diff.get('removed', ())))
+        # 新的存储状态和索引都构建完成后再替换，正在处理的回调继续使用旧的索引和状态
+        # 还没有建立索引时不需要更新，第一次使用时按新的状态构建
+        if diff.get('reload'):
+            index = None
+        else:
+            if index is not None:
+                index = index.apply(diff, store)
+            # 内容有变化的连接需要重新审核；多个 worker 各自检测到同一次变化时只由第一个重置
+            if diff['modified']:
+                reviews.reset_modified(diff['modified'], os.path.abspath(CSV_PATH), diff['stat'])
+        graph = None
+        return diff
+
+# 下拉框 id -> 信号列
+DROPDOWN_COLUMNS = [
+    ('src-module-filter', 'SRC_MODULE'),
+    ('src-sig-filter', 'SRC_SIG'),
+    ('dst-module-filter', 'DST_MODULE'),
+    ('dst-sig-filter', 'DST_SIG'),
+]
+
+# 审核状态不再改写 CSV：默认保存在 SQLite 中，支持多进程多用户同时审核；
+# CONN_REVIEW_BACKEND=journal 时使用单进程的追加日志
+JOURNAL_PATH = os.path.splitext(CSV_PATH)[0] + '.reviews.log'
+if os.environ.get('CONN_REVIEW_BACKEND', 'sqlite') == 'journal':
+    reviews = ReviewJournal(JOURNAL_PATH)
+else:
+    reviews = ReviewDB(os.path.splitext(CSV_PATH)[0] + '.reviews.db')
+    if not reviews.state and os.path.exists(JOURNAL_PATH):
+        reviews.import_state(ReviewJournal(JOURNAL_PATH).state)
+
+# DataTable 筛选表达式中的运算符，s/i 前缀表示区分/不区分大小写
+FILTER_OPERATORS = {
+    'eq': 'eq', '=': 'eq',
+    'ne': 'ne', '!=': 'ne',
+    'lt': 'lt', '<': 'lt',
+    'le': 'le', '<=': 'le',
+    'gt': 'gt', '>': 'gt',
+    'ge': 'ge', '>=': 'ge',
+    'contains': 'contains',
+    'datestartswith': 'datestartswith',
+}
+FILTER_PART_RE = re.compile(r'^\s*\{(?P<col>[^}]+)\}\s+(?P<op>[si]?[a-z]+|[<>!]?=|[<>])\s+(?P<val>.*?)\s*$')
+
+def split_filter_part(filter_part):
+    # 解析 "{列名} 运算符 值" 形式的单个筛选条件
+    m = FILTER_PART_RE.match(filter_part)
+    if not m:
+        return None, None, None, False
+    op = m.group('op')
+    case_insensitive = False
+    if op not in FILTER_OPERATORS and op[0] in 'si' and op[1:] in FILTER_OPERATORS:
+        case_insensitive = op[0] == 'i'
+        op = op[1:]
+    if op not in FILTER_OPERATORS:
+        return None, None, None, False
+
+    value = m.group('val')
+    if value and value[0] == value[-1] and value[0] in ('"', "'", '`') and len(value) > 1:
+        value = value[1:-1].replace('\\' + value[0], value[0])
+    else:
+        try:
+            value = float(value)
+        except ValueError:
+            pass
+    return m.group('col'), FILTER_OPERATORS[op], value, case_insensitive
+
+def filter_frame(frame, filter_query):
+    # 在服务端按 DataTable 的 filter_query 筛选
+    if not filter_query:
+        return frame
+    mask = pd.Series(True, index=frame.index)
+    for filter_part in filter_query.split(' && '):
+        col, op, value, case_insensitive = split_filter_part(filter_part)
+        if col not in frame.columns:
+            continue
+        series = frame[col]
+        # 布尔列(如 Reviewed)转成字符串后为 'True'/'False'，按不区分大小写比较，输入 true 也能匹配
+        if series.dtype == bool and isinstance(value, str):
+            case_insensitive = True
+        if op == 'contains' or op == 'datestartswith' or (isinstance(value, str) and series.dtype != object):
+            series = series.astype(str)
+            value = str(value)
+        if case_insensitive and isinstance(value, str):
+            series = series.str.lower()
+            value = value.lower()
+
+        if op == 'contains':
+            mask &= series.str.contains(value, regex=False)
+        elif op == 'datestartswith':
+            mask &= series.str.startswith(value)
+        elif op == 'eq':
+            mask &= series == value
+        elif op == 'ne':
+            mask &= series != value
+        elif op == 'lt':
+            mask &= series < value
+        elif op == 'le':
+            mask &= series <= value
+        elif op == 'gt':
+            mask &= series > value
+        elif op == 'ge':
+            mask &= series >= value
+    return frame[mask]
+
+def query_columns(data, filter_query, sort_by):
+    # 筛选和排序用到的列，只加载这些列
+    columns = list(KEY_COLUMNS)
+    for filter_part in (filter_query or '').split(' && '):
+        col = split_filter_part(filter_part)[0]
+        if col in data.columns and col not in columns:
+            columns.append(col)
+    for col in sort_by or []:
+        if col['column_id'] in data.columns and col['column_id'] not in columns:
+            columns.append(col['column_id'])
+    return columns
+
+def sort_frame(frame, sort_by):
+    if not sort_by:
+        return frame
+    return frame.sort_values(
+        [col['column_id'] for col in sort_by],
+        ascending=[col['direction'] == 'asc' for col in sort_by],
+        inplace=False,
+        kind='stable',
+        # categorical 列按字符串排序，而不是按类别出现顺序
+        key=lambda s: s.astype(str) if isinstance(s.dtype, pd.CategoricalDtype) else s
+    )
+
+def reviewed_frame(data, frame):
+    # 用审核日志覆盖 CSV 中的 Reviewed 列
+    if 'Reviewed' in frame.columns:
+        frame = frame.assign(Reviewed=reviews.apply(data.ids_of(frame.index), frame['Reviewed']))
+    return frame
+
+def page_records(data, frame, page_current, page_size):
+    # 只读取并发送当前页的数据，行 id 为稳定的连接 ID
+    # data 为 ConnStore 或索引对应的 StoreState
+    return row_records(data, list(frame.index[page_current * page_size:(page_current + 1) * page_size]))
+
+def row_records(data, rows):
+    page = data.take(rows)
+    ids = conn_ids(page)
+    page = page.assign(Reviewed=reviews.apply(ids, page['Reviewed']))
+    records = page.to_dict('records')
+    for record, cid in zip(records, ids):
+        record['id'] = cid
+        # 客户端看到的审核状态版本，审核时用于检查是否已被其他用户修改
+        record['_version'] = reviews.version(cid)
+    return records
+
+def page_count(frame, page_size):
+    return max(1, (len(frame) + page_size - 1) // page_size)
+
+def dropdown_selections(*values):
+    # 四个下拉框的选中值 -> {列名: 选中值列表}
+    return {col: value or [] for (_, col), value in zip(DROPDOWN_COLUMNS, values)}
 
 # 初始化 Dash 应用程序
 app = dash.Dash(__name__)
+# 多进程部署时使用，例如：gunicorn -w 4 conn:server
+server = app.server
 
 # 定义应用程序布局
 app.layout = html.Div([
@@ -21,32 +227,36 @@ app.layout = html.Div([
     html.Label('按 SRC_MODULE 筛选：'),
     dcc.Dropdown(
         id='src-module-filter',
-        options=[{'label': module, 'value': module} for module in df['SRC_MODULE'].unique()],
+        options=[],  # 候选值在页面加载和输入时由回调按需搜索
         multi=True,
+        placeholder='输入前缀搜索',
         value=[]  # 初始值为空列表
     ),
 
     html.Label('按 SRC_SIG 筛选：'),
     dcc.Dropdown(
         id='src-sig-filter',
-        options=[{'label': sig, 'value': sig} for sig in df['SRC_SIG'].unique()],
+        options=[],  # 候选值在页面加载和输入时由回调按需搜索
         multi=True,
+        placeholder='输入前缀搜索',
         value=[]  # 初始值为空列表
     ),
 
     html.Label('按 DST_MODULE 筛选：'),
     dcc.Dropdown(
         id='dst-module-filter',
-        options=[{'label': module, 'value': module} for module in df['DST_MODULE'].unique()],
+        options=[],  # 候选值在页面加载和输入时由回调按需搜索
         multi=True,
+        placeholder='输入前缀搜索',
         value=[]  # 初始值为空列表
     ),
 
     html.Label('按 DST_SIG 筛选：'),
     dcc.Dropdown(
         id='dst-sig-filter',
-        options=[{'label': sig, 'value': sig} for sig in df['DST_SIG'].unique()],
+        options=[],  # 候选值在页面加载和输入时由回调按需搜索
         multi=True,
+        placeholder='输入前缀搜索',
         value=[]  # 初始值为空列表
     ),
 
@@ -56,12 +266,17 @@ app.layout = html.Div([
             id='datatable',
             columns=[
                 {'name': col, 'id': col, 'editable': True if col == 'Reviewed' else False}  # 'Reviewed' 列可编辑
-                for col in df.columns
+                for col in store.columns
             ],
-            data=df.to_dict('records'),
-            filter_action='native',  # 启用列筛选
-            sort_action='native',    # 启用列排序
+            # 首页和页数只需要行数，不加载任何列
+            data=row_records(store, range(min(10, len(store)))),
+            filter_action='custom',  # 列筛选在服务端执行
+            sort_action='custom',    # 列排序在服务端执行
+            sort_mode='multi',
+            page_action='custom',    # 服务端分页，只传当前页
+            page_current=0,
             page_size=10,            # 每页显示 10 行
+            page_count=page_count(store, 10),
             row_selectable='multi',  # 允许多行选择
             selected_rows=[]         # 初始化选中行为空列表
         )
@@ -71,60 +286,181 @@ app.layout = html.Div([
     html.Button('审核选中行', id='review-button', n_clicks=0),
 
     # 审核状态消息
-    html.Div(id='review-status')
+    html.Div(id='review-status'),
+
+    # 定期检查其他用户的审核，有变化时刷新当前页
+    dcc.Interval(id='review-refresh', interval=5000),
+    dcc.Store(id='review-seq', data=0),
+
+    # 连接关系查询：节点为 模块.信号
+    html.H2('连接关系查询'),
+    dcc.RadioItems(
+        id='graph-mode',
+        options=[
+            {'label': '扇出（节点能到达哪些信号）', 'value': 'fanout'},
+            {'label': '扇入（哪些信号能到达节点）', 'value': 'fanin'},
+            {'label': '路径（节点到目标节点）', 'value': 'paths'},
+        ],
+        value='fanin'
+    ),
+    html.Label('节点：'),
+    dcc.Dropdown(id='graph-node', placeholder='输入前缀搜索'),
+    html.Label('目标节点（路径查询）：'),
+    dcc.Dropdown(id='graph-target', placeholder='输入前缀搜索'),
+    html.Label('最大跳数：'),
+    dcc.Input(id='graph-hops', type='number', min=1, value=3),
+    dash_table.DataTable(
+        id='graph-table',
+        columns=[{'name': 'NODE', 'id': 'NODE'}, {'name': 'HOPS', 'id': 'HOPS'}],
+        data=[],
+        sort_action='native',
+        page_size=20
+    ),
+    html.Div(id='graph-status')
 ])
 
 # 定义回调函数以根据筛选条件更新表格数据和处理审核按钮点击事件
 @app.callback(
-    [Output('datatable', 'data'), Output('review-status', 'children')],
+    [Output('datatable', 'data'), Output('datatable', 'page_count'), Output('datatable', 'page_current'),
+     Output('review-status', 'children'), Output('review-seq', 'data')],
     [Input('src-module-filter', 'value'),
      Input('src-sig-filter', 'value'),
      Input('dst-module-filter', 'value'),
      Input('dst-sig-filter', 'value'),
-     Input('review-button', 'n_clicks')],
-    [State('datatable', 'selected_rows'),
-     State('datatable', 'data')]
+     Input('datatable', 'page_current'),
+     Input('datatable', 'page_size'),
+     Input('datatable', 'sort_by'),
+     Input('datatable', 'filter_query'),
+     Input('review-button', 'n_clicks'),
+     Input('review-refresh', 'n_intervals')],
+    [State('datatable', 'selected_row_ids'),
+     State('datatable', 'data'),
+     State('review-seq', 'data')]
 )
-def update_datatable_and_review_status(src_module_values, src_sig_values, dst_module_values, dst_sig_values, n_clicks, selected_rows, table_data):
+def update_datatable_and_review_status(src_module_values, src_sig_values, dst_module_values, dst_sig_values,
+                                       page_current, page_size, sort_by, filter_query, n_clicks, n_intervals,
+                                       selected_row_ids, table_data, review_seq):
     ctx = dash.callback_context
     if not ctx.triggered:
         # 没有触发器，返回不更新
-        return dash.no_update, dash.no_update
+        return dash.no_update, dash.no_update, dash.no_update, dash.no_update, dash.no_update
     
     # 确定触发回调的输入组件
     trigger_id = ctx.triggered[0]['prop_id'].split('.')[0]
-    
-    # 根据筛选条件更新表格数据
-    if trigger_id in ['src-module-filter', 'src-sig-filter', 'dst-module-filter', 'dst-sig-filter']:
-        filtered_df = df.copy()
-        if src_module_values:
-            filtered_df = filtered_df[filtered_df['SRC_MODULE'].isin(src_module_values)]
-        if src_sig_values:
-            filtered_df = filtered_df[filtered_df['SRC_SIG'].isin(src_sig_values)]
-        if dst_module_values:
-            filtered_df = filtered_df[filtered_df['DST_MODULE'].isin(dst_module_values)]
-        if dst_sig_values:
-            filtered_df = filtered_df[filtered_df['DST_SIG'].isin(dst_sig_values)]
-        
-        return filtered_df.to_dict('records'), dash.no_update
-    
+
+    status = dash.no_update
+    # 定时检查：CSV 没有变化且没有新的审核时不刷新
+    if trigger_id == 'review-refresh':
+        diff = reload_connections() if WATCH else None
+        reviews.refresh()
+        if diff is None and reviews.last_seq == review_seq:
+            return dash.no_update, dash.no_update, dash.no_update, dash.no_update, dash.no_update
+        if diff is not None and diff.get('reload'):
+            status = html.Div(f'{CSV_PATH} 的列有变化，已重新加载。')
+        elif diff is not None:
+            message = f"{CSV_PATH} 已更新：新增 {len(diff['added'])} 行，删除 {len(diff['removed'])} 行。"
+            if diff['modified']:
+                message += f"其中 {len(diff['modified'])} 个连接内容有变化，需要重新审核。"
+            status = html.Div(message)
+
     # 处理审核按钮点击事件
-    if n_clicks > 0:
-        if len(selected_rows) == 0:
-            return dash.no_update, html.Div('请先选择要审核的行。')
-        
-        for idx in selected_rows:
-            if idx < len(table_data):
-                table_data[idx]['Reviewed'] = True
-                df.at[idx, 'Reviewed'] = True
-        
-        # 将更新后的数据保存回 CSV 文件
-        df.to_csv('connections.csv', index=False)
-
-        return df.to_dict('records'), html.Div(f'已审核 {len(selected_rows)} 行。数据已保存。')
-    
-    return dash.no_update, dash.no_update
+    if trigger_id == 'review-button' and n_clicks > 0:
+        if not selected_row_ids:
+            return dash.no_update, dash.no_update, dash.no_update, html.Div('请先选择要审核的行。'), dash.no_update
+
+        # 按连接 ID 逐行审核，不受筛选和分页影响；版本与页面上看到的不一致时视为冲突
+        expected = {row['id']: row.get('_version', 0) for row in table_data or [] if row.get('id') in selected_row_ids}
+        user = flask.request.headers.get('X-Remote-User') or flask.request.remote_addr or ''
+        conflicts = reviews.mark(selected_row_ids, user=user, expected=expected)
+        if conflicts:
+            status = html.Div(f'已审核 {len(selected_row_ids) - len(conflicts)} 行，'
+                              f'{len(conflicts)} 行已被其他用户修改，已刷新，请确认后重试。')
+        else:
+            status = html.Div(f'已审核 {len(selected_row_ids)} 行。数据已保存。')
+
+    # 根据筛选条件更新表格数据：下拉框条件为倒排索引行号的交集，只取这些行
+    # 索引和它对应的存储状态一起取出，与并发的热更新互不影响
+    with perf.phase('conn.filter', trigger=trigger_id) as p:
+        idx = get_index()
+        data = idx.state
+        filtered_df = data.frame(query_columns(data, filter_query, sort_by))
+        p.count('rows_scanned', len(filtered_df))
+        rows = idx.rows(dropdown_selections(src_module_values, src_sig_values, dst_module_values, dst_sig_values))
+        if rows is not None:
+            filtered_df = filtered_df.loc[rows]
+        filtered_df = reviewed_frame(data, filtered_df)
+        filtered_df = filter_frame(filtered_df, filter_query)
+        filtered_df = sort_frame(filtered_df, sort_by)
+        p.count('rows_filtered', len(filtered_df))
+
+    page_size = page_size or 10
+    # 筛选后页数变少时回到最后一页，并把修正后的页码同步给表格
+    n_pages = page_count(filtered_df, page_size)
+    clamped = min(page_current or 0, n_pages - 1)
+    return (page_records(data, filtered_df, clamped, page_size), n_pages,
+            clamped if clamped != page_current else dash.no_update, status, reviews.last_seq)
+
+def make_options_callback(dropdown_id, col):
+    # 下拉框候选值在服务端按前缀搜索，最多返回 SEARCH_LIMIT 个，
+    # 并且只列出在其他下拉框当前条件下存在的值
+    @app.callback(
+        Output(dropdown_id, 'options'),
+        [Input(dropdown_id, 'search_value')] +
+        [Input(other_id, 'value') for other_id, _ in DROPDOWN_COLUMNS],
+    )
+    def update_options(search_value, *values):
+        selected = dropdown_selections(*values)
+        with perf.phase('conn.options', column=col) as p:
+            options = get_index().search(col, search_value, selected)
+            p.count('options', len(options))
+        # 已选中的值必须保留在候选中，否则会被下拉框清除
+        options += [value for value in selected[col] if value not in options]
+        return [{'label': value, 'value': value} for value in options]
+    return update_options
+
+for dropdown_id, col in DROPDOWN_COLUMNS:
+    make_options_callback(dropdown_id, col)
+
+def make_node_options_callback(dropdown_id):
+    @app.callback(Output(dropdown_id, 'options'), [Input(dropdown_id, 'search_value')], [State(dropdown_id, 'value')])
+    def update_node_options(search_value, value):
+        options = get_graph().search(search_value)
+        if value and value not in options:
+            options.append(value)
+        return [{'label': node, 'value': node} for node in options]
+    return update_node_options
+
+for dropdown_id in ('graph-node', 'graph-target'):
+    make_node_options_callback(dropdown_id)
+
+@app.callback(
+    [Output('graph-table', 'data'), Output('graph-status', 'children')],
+    [Input('graph-mode', 'value'), Input('graph-node', 'value'), Input('graph-target', 'value'),
+     Input('graph-hops', 'value')]
+)
+def update_graph_table(mode, node, target, hops):
+    if not node or (mode == 'paths' and not target):
+        return [], ''
+    g = get_graph()
+    if mode == 'paths':
+        with perf.phase('conn.graph_query', mode=mode, hops=hops) as p:
+            paths = g.paths(node, target, hops or 8)
+            p.count('paths', len(paths))
+        data = [{'NODE': ' -> '.join(path), 'HOPS': len(path) - 1} for path in paths]
+        return data, f'{node} 到 {target} 共 {len(data)} 条路径。'
+    with perf.phase('conn.graph_query', mode=mode, hops=hops) as p:
+        reached = g.fanin(node, hops) if mode == 'fanin' else g.fanout(node, hops)
+        p.count('nodes', len(reached))
+    data = [{'NODE': name, 'HOPS': h} for name, h in sorted(reached.items(), key=lambda item: (item[1], item[0]))]
+    return data, f'共 {len(data)} 个节点。'
 
 # 启动应用程序
+# FUNC_COV_PERF 在加载数据前生效，--perf 只统计启动之后的回调
 if __name__ == '__main__':
-    app.run_server(debug=False)
+    import argparse
+    parser = argparse.ArgumentParser(description="连接关系审核")
+    perf.add_arguments(parser)
+    args = parser.parse_args()
+    perf.enable_from_args(args)
+    # cProfile 只采样当前线程，采样时在主线程中依次处理请求
+    app.run(debug=False, threaded=not args.profile)
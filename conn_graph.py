@@ -0,0 +1,153 @@
+from bisect import bisect_left
+
+import numpy as np
+import pandas as pd
+
+# 搜索节点和路径查询默认最多返回的个数
+SEARCH_LIMIT = 100
+PATH_LIMIT = 1000
+
+def node_names(module, sig):
+    # 节点名为 模块.信号
+    return module.astype(str) + '.' + sig.astype(str)
+
+class ConnGraph(object):
+    # 连接关系图：每行连接是一条 SRC_MODULE.SRC_SIG -> DST_MODULE.DST_SIG 的有向边
+    # 节点为整数编号，出边和入边各自按CSR保存：offsets[n]:offsets[n + 1]为节点n的邻居和对应的行号
+    def __init__(self, frame):
+        src = node_names(frame['SRC_MODULE'], frame['SRC_SIG'])
+        dst = node_names(frame['DST_MODULE'], frame['DST_SIG'])
+        codes, names = pd.factorize(pd.concat([src, dst], ignore_index=True))
+        self.names = list(names)
+        self.node_of = {name: i for i, name in enumerate(self.names)}
+        n_edges = len(src)
+        self.src = codes[:n_edges].astype(np.int64)
+        self.dst = codes[n_edges:].astype(np.int64)
+        # 边号 -> 原始行号
+        self.rows = frame.index.to_numpy()
+
+        self.out_offsets, self.out_nodes, self.out_edges = self._csr(self.src, self.dst)
+        self.in_offsets, self.in_nodes, self.in_edges = self._csr(self.dst, self.src)
+
+        order = sorted(range(len(self.names)), key=lambda i: (self.names[i].lower(), self.names[i]))
+        self.sorted_nodes = order
+        self.sorted_keys = [self.names[i].lower() for i in order]
+
+    def _csr(self, frm, to):
+        order = np.argsort(frm, kind='stable')
+        offsets = np.zeros(len(self.names) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(frm, minlength=len(self.names)), out=offsets[1:])
+        return offsets, to[order], order
+
+    def __len__(self):
+        return len(self.names)
+
+    def node(self, name):
+        if name not in self.node_of:
+            raise Exception('Unknown node:' + name)
+        return self.node_of[name]
+
+    def search(self, prefix='', limit=SEARCH_LIMIT):
+        # 按前缀(不区分大小写)搜索节点名
+        prefix = (prefix or '').lower()
+        lo = bisect_left(self.sorted_keys, prefix)
+        return [self.names[i] for i in self.sorted_nodes[lo:lo + limit]
+                if self.names[i].lower().startswith(prefix)]
+
+    def _neighbors(self, offsets, nodes, frontier):
+        # 一组节点的所有邻居，向量化展开各节点在CSR中的区间
+        starts = offsets[frontier]
+        counts = offsets[frontier + 1] - starts
+        total = int(counts.sum())
+        if not total:
+            return np.empty(0, dtype=np.int64)
+        shift = np.repeat(starts - np.concatenate(([0], np.cumsum(counts)[:-1])), counts)
+        return nodes[shift + np.arange(total)]
+
+    def _reach(self, node, offsets, nodes, max_hops):
+        # 按层BFS，返回 {节点编号: 跳数}，max_hops为None时求传递闭包
+        hops = np.full(len(self.names), -1, dtype=np.int64)
+        hops[node] = 0
+        frontier = np.array([node], dtype=np.int64)
+        level = 0
+        while len(frontier) and (max_hops is None or level < max_hops):
+            level += 1
+            nxt = np.unique(self._neighbors(offsets, nodes, frontier))
+            nxt = nxt[hops[nxt] < 0]
+            hops[nxt] = level
+            frontier = nxt
+        return hops
+
+    def fanout(self, name, max_hops=None):
+        # name在max_hops跳内能到达的节点 -> 跳数
+        hops = self._reach(self.node(name), self.out_offsets, self.out_nodes, max_hops)
+        return {self.names[i]: int(hops[i]) for i in np.flatnonzero(hops > 0)}
+
+    def fanin(self, name, max_hops=None):
+        # 在max_hops跳内能到达name的节点 -> 跳数
+        hops = self._reach(self.node(name), self.in_offsets, self.in_nodes, max_hops)
+        return {self.names[i]: int(hops[i]) for i in np.flatnonzero(hops > 0)}
+
+    def paths(self, src, dst, max_hops, limit=PATH_LIMIT):
+        # src到dst不超过max_hops跳的简单路径，每条路径为节点名列表
+        # 先从dst反向BFS得到各节点到dst的最短跳数，DFS时剪掉剩余跳数不够的分支
+        s, d = self.node(src), self.node(dst)
+        to_dst = self._reach(d, self.in_offsets, self.in_nodes, max_hops)
+        if to_dst[s] < 0:
+            return []
+
+        result = list()
+        path = [s]
+        on_path = {s}
+        stack = [iter(self._successors(s))]
+        while stack and len(result) < limit:
+            nxt = next(stack[-1], None)
+            if nxt is None:
+                stack.pop()
+                on_path.discard(path.pop())
+                continue
+            nxt = int(nxt)
+            remain = max_hops - len(path)
+            if nxt in on_path or to_dst[nxt] < 0 or to_dst[nxt] > remain:
+                continue
+            if nxt == d:
+                result.append([self.names[i] for i in path] + [self.names[d]])
+                continue
+            if remain > 0:
+                path.append(nxt)
+                on_path.add(nxt)
+                stack.append(iter(self._successors(nxt)))
+        return result
+
+    def _successors(self, n):
+        # 重复的连接只算一条边
+        return np.unique(self.out_nodes[self.out_offsets[n]:self.out_offsets[n + 1]])
+
+    def edge_rows(self, name, direction='out'):
+        # 节点的出边/入边对应的连接行号
+        n = self.node(name)
+        if direction == 'out':
+            edges = self.out_edges[self.out_offsets[n]:self.out_offsets[n + 1]]
+        else:
+            edges = self.in_edges[self.in_offsets[n]:self.in_offsets[n + 1]]
+        return self.rows[edges]
+
+if __name__ == '__main__':
+    import argparse
+    from conn_store import ConnStore, KEY_COLUMNS
+    parser = argparse.ArgumentParser(description="查询连接关系的扇入/扇出和路径")
+    parser.add_argument('node', help='节点名，模块.信号')
+    parser.add_argument('--csv', default='connections.csv', help='连接数据CSV')
+    parser.add_argument('--fanin', action='store_true', help='查询扇入，默认查询扇出')
+    parser.add_argument('--to', default=None, help='查询到该节点的路径')
+    parser.add_argument('--hops', type=int, default=None, help='最大跳数，路径查询默认为8')
+    args = parser.parse_args()
+
+    graph = ConnGraph(ConnStore(args.csv).frame(KEY_COLUMNS))
+    if args.to:
+        for path in graph.paths(args.node, args.to, args.hops or 8):
+            print(' -> '.join(path))
+    else:
+        reached = graph.fanin(args.node, args.hops) if args.fanin else graph.fanout(args.node, args.hops)
+        for name, hops in sorted(reached.items(), key=lambda item: (item[1], item[0])):
+            print(f"hops:{hops},node:{name}")
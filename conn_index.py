@@ -0,0 +1,183 @@
+import copy
+from bisect import bisect_left
+
+import numpy as np
+import pandas as pd
+
+from conn_store import KEY_COLUMNS
+
+# 下拉框搜索最多返回的候选值个数
+SEARCH_LIMIT = 100
+
+class ColumnIndex(object):
+    # 单个信号列的倒排索引：值 -> 有序行号列表
+    # 所有值的行号按值分组连续存放在rows中，offsets[code]:offsets[code + 1]为该值的行号，即CSR结构
+    # 值另按小写排序，前缀搜索在有序值上二分
+    # 增量更新时新增行的行号放在extra中，删除的行由ConnIndex的live过滤，counts为各值的有效行数
+    # 增量更新生成新的索引，原索引不变；values和code_of只追加，新旧索引共用
+    def __init__(self, column):
+        if not isinstance(column.dtype, pd.CategoricalDtype):
+            column = column.astype('category')
+        self.values = list(column.cat.categories)
+        self.codes = column.cat.codes.to_numpy()
+        # 新增行的code，行号从n_base开始
+        self.n_base = len(self.codes)
+        self.added_codes = np.empty(0, dtype=np.int64)
+
+        # 稳定排序保证每个值的行号有序
+        self.rows = np.argsort(self.codes, kind='stable')
+        counts = np.bincount(self.codes[self.codes >= 0], minlength=len(self.values))
+        self.offsets = np.zeros(len(self.values) + 1, dtype=np.int64)
+        np.cumsum(counts, out=self.offsets[1:])
+        # 缺失值(code为-1)排在最前面，跳过
+        self.offsets += len(self.codes) - self.offsets[-1]
+
+        self.counts = counts
+        self.extra = dict()
+
+        self.code_of = {value: code for code, value in enumerate(self.values)}
+        order = sorted(range(len(self.values)), key=self._sort_key)
+        self.sorted_codes = order
+        self.sorted_keys = [self._sort_key(code) for code in order]
+        self._rank = None
+
+    def _sort_key(self, code):
+        value = self.values[code]
+        return value.lower(), value
+
+    @property
+    def rank(self):
+        # code -> 在有序值中的位置，新增值后重新计算
+        if self._rank is None:
+            # values可能已被更新的索引追加，只计算本索引中有的值
+            rank = np.empty(len(self.sorted_codes), dtype=np.int64)
+            rank[self.sorted_codes] = np.arange(len(self.sorted_codes))
+            self._rank = rank
+        return self._rank
+
+    def codes_of(self, rows):
+        rows = np.asarray(rows, dtype=np.int64)
+        if not len(self.added_codes):
+            return self.codes[rows]
+        codes = np.empty(len(rows), dtype=np.int64)
+        base = rows < self.n_base
+        codes[base] = self.codes[rows[base]]
+        codes[~base] = self.added_codes[rows[~base] - self.n_base]
+        return codes
+
+    def applied(self, removed, rows, values):
+        # 返回删除removed行、追加新增行后的新索引，rows为递增的行号，开销只与变化的行数和值的个数有关
+        new = copy.copy(self)
+        new.extra = dict(self.extra)
+        codes = np.empty(len(values), dtype=np.int64)
+        added_rows = dict()
+        for i, value in enumerate(values):
+            if not isinstance(value, str):
+                # 缺失值
+                codes[i] = -1
+                continue
+            code = self.code_of.get(value)
+            if code is None or code >= len(self.sorted_codes):
+                if code is None:
+                    code = len(self.values)
+                    self.values.append(value)
+                    self.code_of[value] = code
+                if new.sorted_keys is self.sorted_keys:
+                    new.sorted_keys = list(self.sorted_keys)
+                    new.sorted_codes = list(self.sorted_codes)
+                    new._rank = None
+                key = self._sort_key(code)
+                pos = bisect_left(new.sorted_keys, key)
+                if pos == len(new.sorted_keys) or new.sorted_keys[pos] != key:
+                    new.sorted_keys.insert(pos, key)
+                    new.sorted_codes.insert(pos, code)
+            codes[i] = code
+            added_rows.setdefault(code, list()).append(int(rows[i]))
+        for code, code_rows in added_rows.items():
+            new.extra[code] = self.extra.get(code, list()) + code_rows
+
+        counts = np.zeros(len(new.sorted_codes), dtype=np.int64)
+        counts[:len(self.counts)] = self.counts
+        np.add.at(counts, codes[codes >= 0], 1)
+        old = self.codes_of(removed)
+        np.subtract.at(counts, old[old >= 0], 1)
+        new.counts = counts
+        new.added_codes = np.concatenate([self.added_codes, codes])
+        return new
+
+    def postings(self, values, live=None):
+        # 若干值的有效行号并集，有序
+        parts = list()
+        for value in values:
+            code = self.code_of.get(value)
+            if code is None:
+                continue
+            if code < len(self.offsets) - 1:
+                parts.append(self.rows[self.offsets[code]:self.offsets[code + 1]])
+            if code in self.extra:
+                parts.append(np.array(self.extra[code], dtype=np.int64))
+        if not parts:
+            return np.empty(0, dtype=np.int64)
+        # 不同值的行号互不相交，同一个值的extra行号都大于原有行号
+        rows = parts[0] if len(parts) == 1 else np.sort(np.concatenate(parts))
+        if live is not None:
+            rows = rows[live[rows]]
+        return rows
+
+    def search(self, prefix='', rows=None, limit=SEARCH_LIMIT):
+        # 按前缀(不区分大小写)搜索值，rows不为None时只返回这些行中出现的值
+        prefix = prefix.lower()
+        lo = bisect_left(self.sorted_keys, (prefix,))
+        hi = bisect_left(self.sorted_keys, (prefix + '\U0010ffff',)) if prefix else len(self.sorted_keys)
+        if rows is None:
+            # 跳过所有行都已删除的值
+            values = list()
+            for r in range(lo, hi):
+                code = self.sorted_codes[r]
+                if self.counts[code] > 0:
+                    values.append(self.values[code])
+                    if len(values) >= limit:
+                        break
+            return values
+        # 缺失值的code为-1，不能作为rank的下标
+        codes = self.codes_of(rows)
+        reachable = np.unique(self.rank[codes[codes >= 0]])
+        start, end = np.searchsorted(reachable, [lo, hi])
+        return [self.values[self.sorted_codes[r]] for r in reachable[start:min(end, start + limit)]]
+
+class ConnIndex(object):
+    # 四个信号列的倒排索引，下拉框筛选为各列行号集合的交集
+    # state为建立索引时的StoreState，同一个请求中用它读取数据，保证与索引一致
+    def __init__(self, store):
+        self.state = store.state
+        self.columns = {col: ColumnIndex(self.state.column(col)) for col in KEY_COLUMNS}
+        self.live = self.state.live
+
+    def apply(self, diff, store):
+        # 返回应用了ConnStore.poll()增量的新索引，只处理新增和删除的行，原索引不变
+        new = copy.copy(self)
+        new.columns = {col: column.applied(diff['removed'], diff['added'], list(diff['frame'][col]))
+                       for col, column in self.columns.items()}
+        new.state = store.state
+        new.live = new.state.live
+        return new
+
+    def rows(self, selections, skip=None):
+        # selections为列名 -> 选中的值列表；返回满足所有非空条件的有序行号，没有条件时返回None
+        # skip为不参与筛选的列，用于计算该列下拉框在其他条件下可选的值
+        sets = [self.columns[col].postings(values, self.live) for col, values in selections.items()
+                if values and col != skip]
+        if not sets:
+            return None
+        sets.sort(key=len)
+        rows = sets[0]
+        for other in sets[1:]:
+            if not len(rows):
+                break
+            rows = np.intersect1d(rows, other, assume_unique=True)
+        return rows
+
+    def search(self, col, prefix='', selections=None, limit=SEARCH_LIMIT):
+        # 级联搜索：只返回其他列当前条件下可达的值
+        rows = self.rows(selections or {}, skip=col)
+        return self.columns[col].search(prefix or '', rows, limit)
@@ -0,0 +1,192 @@
+import os
+import sqlite3
+import threading
+import time
+
+class ReviewJournal(object):
+    # 审核状态的追加日志，按连接ID保存
+    # 每次审核只追加选中行的记录(连接ID\t是否审核\t时间\t用户)，不改写connections.csv；
+    # 日志记录数超过有效条目数的compact_ratio倍时压缩为每个连接一条
+    def __init__(self, path, compact_ratio=2, min_compact=10000):
+        self.path = path
+        self.compact_ratio = compact_ratio
+        self.min_compact = min_compact
+        self.state = dict()  # 连接ID -> 是否审核
+        self.n_records = 0
+        self.last_seq = 0    # 本进程内的修改序号
+        self.load()
+
+    def load(self):
+        self.state = dict()
+        self.n_records = 0
+        if not os.path.exists(self.path):
+            return
+        with open(self.path) as f:
+            for line in f:
+                parts = line.rstrip('\n').split('\t')
+                if len(parts) < 2:
+                    # 写入中途退出留下的半行
+                    continue
+                self.state[parts[0]] = parts[1] == '1'
+                self.n_records += 1
+
+    def mark(self, ids, reviewed=True, user='', expected=None):
+        # 单进程使用，不做并发检查
+        now = time.strftime('%Y-%m-%d %H:%M:%S')
+        flag = '1' if reviewed else '0'
+        with open(self.path, 'a') as f:
+            f.write(''.join(f'{cid}\t{flag}\t{now}\t{user}\n' for cid in ids))
+        for cid in ids:
+            self.state[cid] = reviewed
+        self.n_records += len(ids)
+        self.last_seq += 1
+
+        if self.n_records > max(self.min_compact, self.compact_ratio * len(self.state)):
+            self.compact()
+        return []
+
+    def reset_modified(self, ids, source, stat, user=''):
+        # 单进程使用，直接把已审核的连接改回未审核
+        changed = [cid for cid in ids if self.state.get(cid)]
+        if changed:
+            self.mark(changed, reviewed=False, user=user)
+        return True
+
+    def version(self, cid):
+        return 0
+
+    def refresh(self):
+        pass
+
+    def compact(self):
+        now = time.strftime('%Y-%m-%d %H:%M:%S')
+        tmp = self.path + '.tmp'
+        with open(tmp, 'w') as f:
+            for cid, reviewed in self.state.items():
+                f.write(f"{cid}\t{'1' if reviewed else '0'}\t{now}\t\n")
+        os.replace(tmp, self.path)
+        self.n_records = len(self.state)
+
+    def apply(self, ids, base):
+        # ids为连接ID的Series，base为CSV中原有的Reviewed列，返回合并日志后的审核状态
+        if not self.state:
+            return base.astype(bool)
+        state = ids.map(self.state)
+        return state.where(state.notna(), base).astype(bool)
+
+class ReviewDB(object):
+    # 多进程/多用户共享的审核状态，保存在WAL模式的SQLite中
+    # 每个连接一行，version用于乐观并发控制；seq为全局递增的修改序号，
+    # 各进程只拉取seq大于上次的记录，无需重新加载即可看到其他用户的审核
+    def __init__(self, path, timeout=30):
+        self.path = path
+        self.timeout = timeout
+        self._local = threading.local()
+        self.state = dict()    # 连接ID -> 是否审核
+        self.versions = dict() # 连接ID -> version
+        self.last_seq = 0
+        self._lock = threading.Lock()
+
+        db = self._db()
+        db.execute('PRAGMA journal_mode=WAL')
+        db.execute('''CREATE TABLE IF NOT EXISTS reviews (
+            conn_id TEXT PRIMARY KEY,
+            reviewed INTEGER NOT NULL,
+            version INTEGER NOT NULL,
+            seq INTEGER NOT NULL,
+            user TEXT,
+            updated_at TEXT)''')
+        db.execute('CREATE INDEX IF NOT EXISTS reviews_seq ON reviews(seq)')
+        # 各源文件最近一次已处理的指纹，多进程各自检测到同一次变化时只处理一次
+        db.execute('''CREATE TABLE IF NOT EXISTS sources (
+            path TEXT PRIMARY KEY,
+            mtime_ns INTEGER NOT NULL,
+            size INTEGER NOT NULL)''')
+        db.commit()
+        self.refresh()
+
+    def _db(self):
+        # sqlite连接不能跨进程/线程共享，每个进程的每个线程各自打开
+        db = getattr(self._local, 'db', None)
+        if db is None or self._local.pid != os.getpid():
+            db = sqlite3.connect(self.path, timeout=self.timeout)
+            db.execute('PRAGMA synchronous=NORMAL')
+            self._local.db = db
+            self._local.pid = os.getpid()
+        return db
+
+    def refresh(self):
+        # 增量拉取其他进程的修改
+        rows = self._db().execute(
+            'SELECT conn_id, reviewed, version, seq FROM reviews WHERE seq > ? ORDER BY seq', (self.last_seq,)).fetchall()
+        with self._lock:
+            for cid, reviewed, version, seq in rows:
+                self.state[cid] = bool(reviewed)
+                self.versions[cid] = version
+                self.last_seq = max(self.last_seq, seq)
+
+    def mark(self, ids, reviewed=True, user='', expected=None):
+        # expected为连接ID -> 客户端看到的version(未审核过为0)，与数据库不一致的行视为冲突不修改
+        # 返回冲突的连接ID列表
+        now = time.strftime('%Y-%m-%d %H:%M:%S')
+        conflicts = list()
+        db = self._db()
+        with db:
+            db.execute('BEGIN IMMEDIATE')
+            seq = db.execute('SELECT COALESCE(MAX(seq), 0) + 1 FROM reviews').fetchone()[0]
+            for cid in ids:
+                version = None if expected is None else expected.get(cid)
+                if version is None:
+                    db.execute('''INSERT INTO reviews (conn_id, reviewed, version, seq, user, updated_at)
+                        VALUES (?, ?, 1, ?, ?, ?)
+                        ON CONFLICT(conn_id) DO UPDATE SET reviewed=excluded.reviewed, version=reviews.version + 1,
+                            seq=excluded.seq, user=excluded.user, updated_at=excluded.updated_at''',
+                        (cid, int(reviewed), seq, user, now))
+                elif version == 0:
+                    cur = db.execute('''INSERT OR IGNORE INTO reviews (conn_id, reviewed, version, seq, user, updated_at)
+                        VALUES (?, ?, 1, ?, ?, ?)''', (cid, int(reviewed), seq, user, now))
+                    if cur.rowcount == 0:
+                        conflicts.append(cid)
+                else:
+                    cur = db.execute('''UPDATE reviews SET reviewed=?, version=version + 1, seq=?, user=?, updated_at=?
+                        WHERE conn_id=? AND version=?''', (int(reviewed), seq, user, now, cid, version))
+                    if cur.rowcount == 0:
+                        conflicts.append(cid)
+        self.refresh()
+        return conflicts
+
+    def reset_modified(self, ids, source, stat, user=''):
+        # 源文件中内容有变化的连接改回未审核；stat为处理的源文件指纹(mtime_ns, size)
+        # 只在把记录的指纹向前推进的事务中执行：其他进程稍后检测到同一次变化时不再重置，
+        # 不会覆盖这期间的重新审核。返回是否执行了重置
+        now = time.strftime('%Y-%m-%d %H:%M:%S')
+        db = self._db()
+        with db:
+            db.execute('BEGIN IMMEDIATE')
+            row = db.execute('SELECT mtime_ns, size FROM sources WHERE path=?', (source,)).fetchone()
+            if row is not None and (row[0] > stat[0] or tuple(row) == tuple(stat)):
+                return False
+            db.execute('''INSERT INTO sources (path, mtime_ns, size) VALUES (?, ?, ?)
+                ON CONFLICT(path) DO UPDATE SET mtime_ns=excluded.mtime_ns, size=excluded.size''',
+                (source, stat[0], stat[1]))
+            seq = db.execute('SELECT COALESCE(MAX(seq), 0) + 1 FROM reviews').fetchone()[0]
+            db.executemany('''UPDATE reviews SET reviewed=0, version=version + 1, seq=?, user=?, updated_at=?
+                WHERE conn_id=? AND reviewed=1''', [(seq, user, now, cid) for cid in ids])
+        self.refresh()
+        return True
+
+    def version(self, cid):
+        return self.versions.get(cid, 0)
+
+    def import_state(self, state):
+        # 从审核日志迁移
+        if state:
+            self.mark([cid for cid, reviewed in state.items() if reviewed])
+            self.mark([cid for cid, reviewed in state.items() if not reviewed], reviewed=False)
+
+    def apply(self, ids, base):
+        self.refresh()
+        if not self.state:
+            return base.astype(bool)
+        state = ids.map(self.state)
+        return state.where(state.notna(), base).astype(bool)
@@ -0,0 +1,467 @@
+import io
+import os
+import tempfile
+from bisect import bisect_right
+from itertools import repeat
+
+import numpy as np
+import pandas as pd
+from pandas.api.types import union_categoricals
+
+# 可选依赖：pyarrow用于把CSV转换成Parquet并按列/row group读取
+try:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    import pyarrow.csv as pacsv
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+
+# 连接的四个信号列，按字典编码/categorical保存
+KEY_COLUMNS = ['SRC_MODULE', 'SRC_SIG', 'DST_MODULE', 'DST_SIG']
+ROW_GROUP_SIZE = 1 << 16
+# 监视CSV变化时每次读取的块大小
+SCAN_BLOCK_SIZE = 1 << 20
+
+def conn_ids(frame):
+    # 稳定的连接ID：四个信号列的64位hash，用16进制字符串避免浏览器端精度丢失
+    hashes = pd.util.hash_pandas_object(frame[KEY_COLUMNS], index=False)
+    return hashes.map('{:016x}'.format)
+
+def convert(csv_path, parquet_path, row_group_size=ROW_GROUP_SIZE):
+    # 流式把CSV转换为Parquet，四个信号列字典编码，缺少Reviewed列时补为False
+    reader = pacsv.open_csv(csv_path, convert_options=pacsv.ConvertOptions(
+        column_types={col: pa.string() for col in KEY_COLUMNS}))
+    # 每个进程写各自的临时文件再改名，多个进程同时启动时互不干扰
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(parquet_path)), suffix='.tmp')
+    os.close(fd)
+    try:
+        _write_parquet(reader, tmp, row_group_size)
+        os.replace(tmp, parquet_path)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+
+def _write_parquet(reader, tmp, row_group_size):
+    writer = None
+    batches = list()
+    n_rows = 0
+
+    def flush():
+        table = pa.Table.from_batches(batches)
+        for col in KEY_COLUMNS:
+            i = table.schema.get_field_index(col)
+            table = table.set_column(i, col, pc.dictionary_encode(table.column(col)))
+        if 'Reviewed' not in table.column_names:
+            table = table.append_column('Reviewed', pa.array([False] * len(table), pa.bool_()))
+        return table
+
+    for batch in reader:
+        batches.append(batch)
+        n_rows += len(batch)
+        if n_rows >= row_group_size:
+            table = flush()
+            if writer is None:
+                writer = pq.ParquetWriter(tmp, table.schema)
+            writer.write_table(table, row_group_size=row_group_size)
+            batches = list()
+            n_rows = 0
+
+    if batches or writer is None:
+        if not batches:
+            batches = [pa.RecordBatch.from_pylist([], schema=reader.schema)]
+        table = flush()
+        if writer is None:
+            writer = pq.ParquetWriter(tmp, table.schema)
+        writer.write_table(table, row_group_size=row_group_size)
+    writer.close()
+
+def _scan_lines(f, block_size=SCAN_BLOCK_SIZE):
+    # 按块流式读取CSV，返回(表头, 各非空数据行的hash, 各非空数据行的行首偏移)，不在内存中保留整个文件
+    # 与pandas一样跳过空行，第i个非空数据行即行号i；hash不含换行符，只换了CRLF/LF的行hash不变
+    header = f.readline()
+    pos = len(header)
+    hashes = list()
+    offsets = list()
+    rest = b''
+    while True:
+        block = f.read(block_size)
+        data = rest + block
+        if block:
+            # 只处理到最后一个完整的行，剩下的半行与下一块拼接
+            cut = data.rfind(b'\n') + 1
+            data, rest = data[:cut], data[cut:]
+        if data:
+            parts = data.split(b'\n')
+            if data.endswith(b'\n'):
+                parts.pop()
+            lines = list(map(bytes.rstrip, parts, repeat(b'\r')))
+            starts = np.fromiter(map(len, parts), dtype=np.int64, count=len(parts)) + 1
+            starts = pos + np.cumsum(starts) - starts
+            keep = np.fromiter(map(len, lines), dtype=np.int64, count=len(lines)) > 0
+            hashes.append(np.fromiter(map(hash, lines), dtype=np.int64, count=len(lines))[keep])
+            offsets.append(starts[keep])
+            pos += len(data)
+        if not block:
+            break
+    if not hashes:
+        return header, np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+    return header, np.concatenate(hashes), np.concatenate(offsets)
+
+def _read_lines_at(f, offsets, positions):
+    # 重新读取指定的非空数据行(不含换行符)，只读取它们所在的区间；positions为升序的行序号
+    if not len(positions):
+        return []
+    lo = int(offsets[positions[0]])
+    f.seek(int(offsets[positions[-1]]))
+    f.readline()
+    hi = f.tell()
+    f.seek(lo)
+    data = f.read(hi - lo)
+    lines = list()
+    for start in offsets[positions].tolist():
+        start -= lo
+        end = data.find(b'\n', start)
+        lines.append(data[start:end if end >= 0 else len(data)].rstrip(b'\r'))
+    return lines
+
+class BaseTable(object):
+    # 只读的基础数据：首次启动把CSV转换为Parquet，之后只读取元数据；列按需加载并缓存，翻页只读取包含目标行的row group
+    # 没有pyarrow时退回到pandas读取CSV，信号列转为categorical；eager为True时立即读取，与之后CSV的变化无关
+    def __init__(self, csv_path, parquet_path, eager=False):
+        self.csv_path = csv_path
+        self.parquet_path = parquet_path
+        self._columns = dict()
+        self._frame = None
+        self._ids = None
+        self.file = None
+        if pa is None:
+            if eager:
+                self._csv_frame()
+            return
+        if not self._parquet_fresh():
+            try:
+                convert(self.csv_path, self.parquet_path)
+            except OSError:
+                # 其他进程同时完成了转换
+                if not self._parquet_fresh():
+                    raise
+        self.file = pq.ParquetFile(self.parquet_path, read_dictionary=KEY_COLUMNS)
+        # 各row group的起始行号
+        self.row_group_starts = [0]
+        for i in range(self.file.num_row_groups):
+            self.row_group_starts.append(self.row_group_starts[-1] + self.file.metadata.row_group(i).num_rows)
+
+    def _parquet_fresh(self):
+        return os.path.exists(self.parquet_path) and \
+            os.path.getmtime(self.parquet_path) >= os.path.getmtime(self.csv_path)
+
+    def _csv_frame(self):
+        if self._frame is None:
+            frame = pd.read_csv(self.csv_path, dtype={col: 'category' for col in KEY_COLUMNS})
+            if 'Reviewed' not in frame.columns:
+                frame['Reviewed'] = False
+            self._frame = frame
+        return self._frame
+
+    @property
+    def columns(self):
+        if self.file is None:
+            return list(self._csv_frame().columns)
+        return self.file.schema_arrow.names
+
+    def __len__(self):
+        if self.file is None:
+            return len(self._csv_frame())
+        return self.file.metadata.num_rows
+
+    def column(self, name):
+        if self.file is None:
+            return self._csv_frame()[name]
+        if name not in self._columns:
+            self._columns[name] = self.file.read(columns=[name]).column(name).to_pandas()
+        return self._columns[name]
+
+    def ids(self):
+        # 所有行的连接ID，首次需要时计算
+        if self._ids is None:
+            self._ids = conn_ids(pd.DataFrame({col: self.column(col) for col in KEY_COLUMNS}))
+        return self._ids
+
+    def take(self, ids, columns):
+        # 按行号取若干行，只读取包含这些行的row group
+        if self.file is None:
+            return self._csv_frame().loc[ids, columns]
+
+        by_group = dict()
+        for row in ids:
+            group = bisect_right(self.row_group_starts, row) - 1
+            by_group.setdefault(group, list()).append(row)
+
+        parts = list()
+        for group, group_rows in by_group.items():
+            part = self.file.read_row_group(group, columns=columns).to_pandas()
+            start = self.row_group_starts[group]
+            part = part.iloc[[row - start for row in group_rows]]
+            part.index = group_rows
+            parts.append(part)
+        if not parts:
+            return pd.DataFrame(columns=columns)
+        return pd.concat(parts).loc[list(ids)]
+
+class StoreState(object):
+    # 某一时刻的连接数据：只读的基础数据 + 新增的行(delta) + 有效行掩码(live)
+    # 增量更新时生成新的StoreState整体替换，正在处理的请求继续使用旧的状态；行号在各状态间保持不变
+    def __init__(self, base, delta=None, live=None, delta_ids=None):
+        self.base = base
+        self.delta = delta          # 新增的行，行索引为行号，从len(base)开始
+        self.live = live            # 有删除的行时为各行是否有效的bool数组
+        self.delta_ids = delta_ids  # 新增行的连接ID
+        self._columns = dict()
+
+    @property
+    def columns(self):
+        return self.base.columns
+
+    def __len__(self):
+        # 有效的行数
+        if self.live is not None:
+            return int(self.live.sum())
+        return self.n_total()
+
+    def n_total(self):
+        # 包括已删除行在内的总行数，即下一个新增行的行号
+        return len(self.base) + (len(self.delta) if self.delta is not None else 0)
+
+    def column(self, name):
+        # 基础数据的列后接新增的行，合并结果在本状态内缓存
+        col = self.base.column(name)
+        if self.delta is None:
+            return col
+        if name not in self._columns:
+            added = self.delta[name]
+            if isinstance(col.dtype, pd.CategoricalDtype):
+                values = union_categoricals([col.array, pd.Categorical(added)], ignore_order=True)
+                combined = pd.Series(values, index=pd.RangeIndex(len(values)), name=name)
+            else:
+                combined = pd.concat([col, added.astype(col.dtype)], ignore_index=True)
+            self._columns[name] = combined
+        return self._columns[name]
+
+    def frame(self, columns):
+        # 只包含指定列的有效行的DataFrame，行索引为行号
+        frame = pd.DataFrame({col: self.column(col) for col in columns})
+        if self.live is not None:
+            frame = frame[self.live]
+        return frame
+
+    def ids(self):
+        # 所有行(包括已删除的行)的连接ID
+        if self.delta is None:
+            return self.base.ids()
+        return pd.concat([self.base.ids(), self.delta_ids])
+
+    def ids_of(self, rows):
+        # 若干行的连接ID，不需要拼接所有行的ID
+        rows = np.asarray(rows, dtype=np.int64)
+        ids = self.base.ids()
+        if self.delta is None:
+            return ids.loc[rows]
+        n = len(self.base)
+        return pd.concat([ids.loc[rows[rows < n]], self.delta_ids.loc[rows[rows >= n]]]).loc[rows]
+
+    def unique(self, name):
+        col = self.column(name)
+        if isinstance(col.dtype, pd.CategoricalDtype):
+            return list(col.cat.categories)
+        return list(col.unique())
+
+    def take(self, ids, columns=None):
+        # 按行号取若干行，基础数据中的行只读取所在的row group
+        columns = columns or self.columns
+        ids = list(ids)
+        n = len(self.base)
+        if self.delta is None or all(row < n for row in ids):
+            return self.base.take(ids, columns)
+        parts = list()
+        base_rows = [row for row in ids if row < n]
+        if base_rows:
+            parts.append(self.base.take(base_rows, columns))
+        parts.append(self.delta.loc[[row for row in ids if row >= n], columns])
+        return pd.concat(parts).loc[ids]
+
+class ConnStore(object):
+    # connections数据的列式存储，读取接口与StoreState一致，总是读取当前状态
+    # watch为True时记录CSV每行的hash，CSV被重新生成后可以用poll()增量更新：
+    # 基础数据不变，删除的行只做标记(live)，新增的行追加在delta中，其余行的行号保持不变
+    def __init__(self, csv_path='connections.csv', parquet_path=None, watch=False):
+        self.csv_path = csv_path
+        self.parquet_path = parquet_path or os.path.splitext(csv_path)[0] + '.parquet'
+        self.watch = watch
+        self.state = None
+        self.open()
+
+    def open(self):
+        if self.watch:
+            self._index_lines()
+        self.state = StoreState(BaseTable(self.csv_path, self.parquet_path, eager=self.watch))
+
+    @property
+    def columns(self):
+        return self.state.columns
+
+    @property
+    def live(self):
+        return self.state.live
+
+    def __len__(self):
+        return len(self.state)
+
+    def n_total(self):
+        return self.state.n_total()
+
+    def column(self, name):
+        return self.state.column(name)
+
+    def frame(self, columns):
+        return self.state.frame(columns)
+
+    def ids(self):
+        return self.state.ids()
+
+    def ids_of(self, rows):
+        return self.state.ids_of(rows)
+
+    def unique(self, name):
+        return self.state.unique(name)
+
+    def take(self, ids, columns=None):
+        return self.state.take(ids, columns)
+
+    def _stat(self):
+        st = os.stat(self.csv_path)
+        return st.st_mtime_ns, st.st_size
+
+    def _index_lines(self):
+        # 按CSV中的顺序记录各行的hash和对应的行号；要求CSV的字段中没有换行，第i个数据行即行号i
+        self._stat_seen = self._stat()
+        with open(self.csv_path, 'rb') as f:
+            self._header, self._file_hashes, _ = _scan_lines(f)
+        self._file_rows = np.arange(len(self._file_hashes), dtype=np.int64)
+
+    def poll(self):
+        # CSV有变化时计算增量并应用，返回增量；没有变化返回None
+        # 增量为dict：added/removed为行号数组，added_ids/removed_ids为连接ID，modified为内容有变化的连接ID，
+        # stat为对应的文件指纹(mtime_ns, size)
+        stat = self._stat()
+        if stat == self._stat_seen:
+            return None
+        diff = self.diff()
+        if self._stat() != stat:
+            # 读取过程中文件还在写，下次再处理
+            return None
+        self._stat_seen = stat
+        if diff is None:
+            # 列发生变化，全部重新加载
+            self.open()
+            return {'reload': True}
+        if not len(diff['added']) and not len(diff['removed']):
+            # 只有空行、换行符或行的顺序变化
+            self._file_hashes = diff['file_hashes']
+            self._file_rows = diff['file_rows']
+            return None
+        self.apply(diff)
+        diff['stat'] = stat
+        return diff
+
+    def diff(self):
+        # 比较新旧CSV的行hash，只解析变化的行
+        # 重新生成的CSV通常保持行的顺序：先向量化跳过相同的开头和结尾，只在中间变化的区间内
+        # 按hash一一对应相同内容的行；文件按块流式读一遍只保留行hash和偏移，新增的行再按偏移读回
+        state = self.state
+        with open(self.csv_path, 'rb') as f:
+            header, hashes, offsets = _scan_lines(f)
+            # 只换了换行符(CRLF/LF)时不算列变化
+            if header.rstrip(b'\r\n') != self._header.rstrip(b'\r\n'):
+                return None
+            old_hashes, old_order = self._file_hashes, self._file_rows
+
+            m = min(len(hashes), len(old_hashes))
+            differ = np.flatnonzero(hashes[:m] != old_hashes[:m])
+            first = int(differ[0]) if len(differ) else m
+            n = m - first
+            differ = np.flatnonzero(hashes[len(hashes) - n:][::-1] != old_hashes[len(old_hashes) - n:][::-1])
+            tail = int(differ[0]) if len(differ) else n
+            end, old_end = len(hashes) - tail, len(old_hashes) - tail
+
+            pool = dict()
+            for h, row in zip(old_hashes[first:old_end].tolist(), old_order[first:old_end].tolist()):
+                pool.setdefault(h, list()).append(row)
+            rows = np.empty(end - first, dtype=np.int64)
+            added_pos = list()
+            for i, h in enumerate(hashes[first:end].tolist()):
+                matched = pool.get(h)
+                if matched:
+                    rows[i] = matched.pop()
+                else:
+                    added_pos.append(i)
+            removed = np.array(sorted(row for matched in pool.values() for row in matched), dtype=np.int64)
+            # 新增的行在同一个打开的文件中按偏移读回，文件被整体替换时读到的仍是同一个版本
+            added_lines = _read_lines_at(f, offsets, [first + i for i in added_pos])
+        rows[added_pos] = np.arange(state.n_total(), state.n_total() + len(added_pos))
+
+        frame = self._parse_lines(added_lines)
+        start = state.n_total()
+        frame.index = pd.RangeIndex(start, start + len(frame))
+        added_ids = conn_ids(frame)
+        # 只为删除的行计算连接ID，不需要所有行的ID
+        removed_ids = conn_ids(state.take(list(removed), KEY_COLUMNS))
+
+        # 同一个连接既被删除又被新增时为修改，非信号列(不含Reviewed)有变化才算内容变化
+        old_rows = pd.Series(removed_ids.index, index=removed_ids.values)
+        old_rows = old_rows[~old_rows.index.duplicated()]
+        same = added_ids[added_ids.isin(old_rows.index)]
+        value_columns = [col for col in frame.columns if col not in KEY_COLUMNS and col != 'Reviewed']
+        modified = list()
+        if len(same) and value_columns:
+            old = state.take(list(old_rows.loc[same.values]), value_columns)
+            new = frame.loc[same.index, value_columns]
+            changed = (old.astype(str).to_numpy() != new.astype(str).to_numpy()).any(axis=1)
+            modified = list(same[changed])
+
+        return {
+            'added': frame.index.to_numpy(),
+            'removed': removed,
+            'added_ids': added_ids,
+            'removed_ids': removed_ids,
+            'modified': modified,
+            'frame': frame,
+            'file_hashes': hashes,
+            'file_rows': np.concatenate([old_order[:first], rows, old_order[old_end:]]),
+        }
+
+    def _parse_lines(self, lines):
+        frame = pd.read_csv(io.BytesIO(self._header + b'\n'.join(lines) + b'\n'),
+                            dtype={col: str for col in KEY_COLUMNS})
+        if 'Reviewed' not in frame.columns:
+            frame['Reviewed'] = False
+        return frame
+
+    def apply(self, diff):
+        # 应用增量：基础数据不变，新增的行追加到delta，删除的行在live中标记为无效，开销只与变化的行数有关
+        # 新状态构建完成后一次替换，并发的读取看到的要么是旧状态要么是新状态
+        state = self.state
+        added = diff['frame']
+        if state.delta is None:
+            delta, delta_ids = added, diff['added_ids']
+        else:
+            delta = pd.concat([state.delta, added])
+            delta_ids = pd.concat([state.delta_ids, diff['added_ids']])
+        live = state.live if state.live is not None else np.ones(state.n_total(), dtype=bool)
+        live = np.concatenate([live, np.ones(len(added), dtype=bool)])
+        live[diff['removed']] = False
+        self.state = StoreState(state.base, delta, live, delta_ids)
+
+        self._file_hashes = diff['file_hashes']
+        self._file_rows = diff['file_rows']
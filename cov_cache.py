@@ -0,0 +1,198 @@
+import json
+import os
+import struct
+import sys
+import tempfile
+from array import array
+
+from disk_cache import DiskCache, DEFAULT_MAX_BYTES
+
+# 可选依赖：有numpy时直接把列映射成数组，避免逐个转换
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+CACHE_MAGIC = b'VCGC'
+CACHE_VERSION = 3
+CACHE_SUFFIX = '.vcgc'
+
+DEFAULT_CACHE_DIR = os.environ.get('VCS_CG_CACHE', os.path.join(os.path.expanduser('~'), '.cache', 'vcs_cg'))
+
+class CoverageCache(DiskCache):
+    # 解析结果的磁盘缓存
+    # 以文件路径/大小/mtime(可选再加内容hash)为key，单个文件或文件列表(合并结果)都可作为key，旧条目按LRU淘汰
+    # 文件格式：magic + 版本 + 头部长度 + json头部(定义和列索引) + 各列的二进制数据
+    suffix = CACHE_SUFFIX
+
+    def __init__(self, cache_dir=DEFAULT_CACHE_DIR, max_bytes=DEFAULT_MAX_BYTES, use_hash=False):
+        DiskCache.__init__(self, cache_dir, max_bytes, use_hash)
+
+    def load(self, files, cg):
+        # 命中时把缓存内容填入cg并返回True
+        key = self.key(files)
+        path = self._path(key)
+        if not read_file(path, cg, key):
+            return False
+
+        self.touch(path)
+        return True
+
+    def store(self, files, cg):
+        os.makedirs(self.cache_dir, exist_ok=True)
+        key = self.key(files)
+        write_file(self._path(key), cg, key)
+        self.evict()
+
+def read_file(path, cg, key=None):
+    # 读取缓存格式的文件并填入cg，文件不存在、格式不符或key不一致时返回False
+    try:
+        with open(path, 'rb') as f:
+            data = f.read()
+    except FileNotFoundError:
+        return False
+
+    if data[:4] != CACHE_MAGIC or data[4] != CACHE_VERSION:
+        return False
+    header_len, = struct.unpack_from('<I', data, 5)
+    offset = 9 + header_len
+    header = json.loads(data[9:offset].decode())
+    if key is not None and header['key'] != key:
+        return False
+
+    columns = dict()
+    for name, typecode, start, length in header['columns']:
+        columns[name] = _read_column(data, offset + start, length, typecode)
+    _fill(cg, header, columns)
+    return True
+
+def write_file(path, cg, key=''):
+    header, columns = _dump(cg)
+    header['key'] = key
+
+    body = list()
+    header['columns'] = list()
+    start = 0
+    for name, col in columns.items():
+        raw = col.tobytes()
+        header['columns'].append((name, col.typecode, start, len(raw)))
+        body.append(raw)
+        start += len(raw)
+    head = json.dumps(header).encode()
+
+    # 先写临时文件再改名，多进程同时写同一条目也不会读到半个文件
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path) or '.', suffix='.tmp')
+    with os.fdopen(fd, 'wb') as f:
+        f.write(CACHE_MAGIC + bytes([CACHE_VERSION]) + struct.pack('<I', len(head)))
+        f.write(head)
+        for raw in body:
+            f.write(raw)
+    os.replace(tmp, path)
+
+def _read_column(data, start, length, typecode):
+    if typecode == 's':
+        # 字符串列：\0分隔的utf-8
+        text = data[start:start + length].decode()
+        return text.split('\0') if text else []
+    if np is not None:
+        return np.frombuffer(data, dtype=np.dtype(typecode), count=length // array(typecode).itemsize, offset=start)
+    col = array(typecode)
+    col.frombytes(data[start:start + length])
+    return col
+
+class _Strings(object):
+    # 把字符串列包装成与array相同的tobytes接口
+    typecode = 's'
+
+    def __init__(self, items):
+        self.items = items
+
+    def tobytes(self):
+        return '\0'.join(self.items).encode()
+
+def _dump(cg):
+    # 把cp/cc的命中数据拼接成少数几列：命中次数、整数命中值、字符串命中值、排除/不可达标记、交叉编码
+    cp_hits = array('q')
+    cp_int_bins = array('q')
+    cp_str_bins = list()
+    cp_excl = array('q')
+    cp_unreach = array('q')
+    cc_codes = array('q')
+    cc_hits = array('q')
+
+    cps = list()
+    for exprname, hit in cg.cp_hit_data.items():
+        bins = hit.bins
+        int_bins = isinstance(bins, array) or (np is not None and isinstance(bins, np.ndarray))
+        if int_bins:
+            cp_int_bins.frombytes(_int64_bytes(bins))
+        else:
+            cp_str_bins.extend(str(b) for b in bins)
+        cp_hits.frombytes(_int64_bytes(hit.hits))
+        if hit.excl is not None:
+            # 合并结果中为标记的test个数，按原值保存
+            cp_excl.extend(int(e) for e in hit.excl)
+            cp_unreach.extend(int(u) for u in hit.unreachable)
+        cps.append({'exprname': exprname, 'type': hit.type, 'n': len(bins),
+                    'int_bins': int_bins, 'excl': hit.excl is not None})
+
+    ccs = list()
+    for name, hit in cg.cc_hit_data.items():
+        cc_codes.extend(hit.hits.keys())
+        cc_hits.extend(hit.hits.values())
+        ccs.append({'name': name, 'cps': hit.cps, 'sizes': hit.sizes, 'n': len(hit.hits)})
+
+    header = {
+        'cp_define_data': cg.cp_define_data,
+        'cc_define_data': cg.cc_define_data,
+        'cps': cps,
+        'ccs': ccs,
+    }
+    columns = {
+        'cp_hits': cp_hits,
+        'cp_int_bins': cp_int_bins,
+        'cp_str_bins': _Strings(cp_str_bins),
+        'cp_excl': cp_excl,
+        'cp_unreach': cp_unreach,
+        'cc_codes': cc_codes,
+        'cc_hits': cc_hits,
+    }
+    return header, columns
+
+def _int64_bytes(values):
+    if np is not None and isinstance(values, np.ndarray):
+        return values.astype('<i8').tobytes()
+    return array('q', values).tobytes()
+
+def _fill(cg, header, columns):
+    # 延迟导入，避免与vcs_cg循环导入
+    from vcs_cg import CpHits, CcHits
+
+    cg.cp_define_data.update(header['cp_define_data'])
+    cg.cc_define_data.update(header['cc_define_data'])
+
+    pos = {'hits': 0, 'int_bins': 0, 'str_bins': 0, 'excl': 0}
+    for cp in header['cps']:
+        n = cp['n']
+        hits = columns['cp_hits'][pos['hits']:pos['hits'] + n]
+        pos['hits'] += n
+        if cp['int_bins']:
+            bins = columns['cp_int_bins'][pos['int_bins']:pos['int_bins'] + n]
+            pos['int_bins'] += n
+        else:
+            bins = [sys.intern(b) for b in columns['cp_str_bins'][pos['str_bins']:pos['str_bins'] + n]]
+            pos['str_bins'] += n
+        excl = unreachable = None
+        if cp['excl']:
+            excl = array('q', columns['cp_excl'][pos['excl']:pos['excl'] + n])
+            unreachable = array('q', columns['cp_unreach'][pos['excl']:pos['excl'] + n])
+            pos['excl'] += n
+        cg.cp_hit_data[sys.intern(cp['exprname'])] = CpHits(cp['type'], bins, hits, excl, unreachable)
+
+    start = 0
+    for cc in header['ccs']:
+        n = cc['n']
+        codes = columns['cc_codes'][start:start + n]
+        hits = columns['cc_hits'][start:start + n]
+        start += n
+        cg.cc_hit_data[cc['name']] = CcHits(cc['cps'], cc['sizes'], {int(c): int(h) for c, h in zip(codes, hits)})
@@ -0,0 +1,196 @@
+import hashlib
+import json
+import os
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+
+from cov_cache import CoverageCache, DEFAULT_CACHE_DIR, read_file, write_file
+from vcs_cg import vcs_cg, find_tests, merge, parse_cached, np, same_bins
+
+class ClosureTracker(object):
+    # 增量覆盖收敛跟踪：保存上次合并后的bin命中状态和每个test的贡献，
+    # 每次只解析新增或修改过的test，并报告新命中的bin和重新变为未命中的bin
+    # 状态目录：tests.json(test指纹) + merged.vcgc(合并结果) + tests/*.vcgc(各test的贡献)
+    def __init__(self, state_dir, cache=None):
+        self.state_dir = state_dir
+        self.cache = cache
+        self.tests = dict()  # test xml路径 -> [size, mtime_ns]
+        self.cg = vcs_cg()
+        self._load()
+
+    def _load(self):
+        path = os.path.join(self.state_dir, 'tests.json')
+        if not os.path.exists(path):
+            return
+        with open(path) as f:
+            self.tests = json.load(f)
+        if not read_file(os.path.join(self.state_dir, 'merged.vcgc'), self.cg, self._state_key()):
+            raise Exception('Inconsistent closure state, remove it to rebuild:' + self.state_dir)
+
+    def _save(self):
+        # 先写合并结果再写指纹表，两者通过key校验一致性
+        write_file(os.path.join(self.state_dir, 'merged.vcgc'), self.cg, self._state_key())
+        tmp = os.path.join(self.state_dir, 'tests.json.tmp')
+        with open(tmp, 'w') as f:
+            json.dump(self.tests, f)
+        os.replace(tmp, os.path.join(self.state_dir, 'tests.json'))
+
+    def _state_key(self):
+        return hashlib.sha1(json.dumps(self.tests, sort_keys=True).encode()).hexdigest()
+
+    def _test_path(self, file, fingerprint):
+        # 文件名包含指纹，更新中途退出时旧的贡献仍然可用
+        name = hashlib.sha1(f'{file}\0{fingerprint[0]}\0{fingerprint[1]}'.encode()).hexdigest()
+        return os.path.join(self.state_dir, 'tests', name + '.vcgc')
+
+    def update(self, vdb, workers=None):
+        os.makedirs(os.path.join(self.state_dir, 'tests'), exist_ok=True)
+
+        files = [os.path.abspath(f) for f in find_tests(vdb)]
+        fingerprints = dict()
+        for file in files:
+            st = os.stat(file)
+            fingerprints[file] = [st.st_size, st.st_mtime_ns]
+        changed = [f for f in files if self.tests.get(f) != fingerprints[f]]
+        removed = [f for f in self.tests if f not in fingerprints]
+
+        before = self._snapshot()
+        stale = list()
+
+        # 扣除修改或删除的test的旧贡献
+        for file in removed + [f for f in changed if f in self.tests]:
+            path = self._test_path(file, self.tests[file])
+            old = vcs_cg()
+            if not read_file(path, old):
+                raise Exception('Missing closure state of test:' + file)
+            self.cg.merge(old, scale=-1)
+            stale.append(path)
+            del self.tests[file]
+
+        # 并行解析新增或修改的test
+        parse = partial(parse_cached, cache=self.cache)
+        if workers == 1 or len(changed) <= 1:
+            results = map(parse, changed)
+            pool = None
+        else:
+            pool = ProcessPoolExecutor(max_workers=workers)
+            results = pool.map(parse, changed)
+        try:
+            for file, one in zip(changed, results):
+                write_file(self._test_path(file, fingerprints[file]), one)
+                self.cg.merge(one)
+                self.tests[file] = fingerprints[file]
+        finally:
+            if pool is not None:
+                pool.shutdown()
+
+        self._save()
+        for path in stale:
+            os.remove(path)
+
+        delta = self._delta(before)
+        delta['tests_changed'] = changed
+        delta['tests_removed'] = removed
+        return delta
+
+    def verify(self, vdb, workers=None):
+        # 与重新全量合并的结果比较，返回不一致的cp/cc名字；增量扣除和累加后应与全量合并完全一致
+        fresh = bin_states(merge(vdb, workers=workers))
+        mine = bin_states(self.cg)
+        return sorted(key for key in set(fresh) | set(mine) if fresh.get(key) != mine.get(key))
+
+    def _snapshot(self):
+        # merge对cp的命中次数列总是生成新对象，保留引用即可；cc的dict是原地更新，需要复制已覆盖集合
+        cp = {exprname: (hit.bins, hit.hits) for exprname, hit in self.cg.cp_hit_data.items()}
+        cc = {name: (hit.sizes, {code for code, n in hit.hits.items() if n > 0})
+              for name, hit in self.cg.cc_hit_data.items()}
+        return {'cp': cp, 'cc': cc}
+
+    def _delta(self, before):
+        newly_hit = defaultdict(list)
+        missed_again = defaultdict(list)
+
+        for exprname, hit in self.cg.cp_hit_data.items():
+            old_bins, old_hits = before['cp'].get(exprname, ([], []))
+            new_bins, new_hits = hit.bins, hit.hits
+            if np is not None and isinstance(new_hits, np.ndarray) and isinstance(old_hits, np.ndarray) \
+                    and same_bins(old_bins, new_bins):
+                # bin列表一致时直接用掩码比较
+                was, now = old_hits > 0, new_hits > 0
+                newly_hit[exprname].extend(str(new_bins[i]) for i in np.flatnonzero(now & ~was))
+                missed_again[exprname].extend(str(new_bins[i]) for i in np.flatnonzero(was & ~now))
+                continue
+            was = {str(b) for b, h in zip(old_bins, old_hits) if h > 0}
+            for b, h in zip(new_bins, new_hits):
+                b = str(b)
+                if h > 0 and b not in was:
+                    newly_hit[exprname].append(b)
+                elif h <= 0 and b in was:
+                    missed_again[exprname].append(b)
+
+        for name, hit in self.cg.cc_hit_data.items():
+            old_sizes, was = before['cc'].get(name, (hit.sizes, set()))
+            now = {code for code, n in hit.hits.items() if n > 0}
+            labels = [self.cg.cp_hit_data[exprname].bins for exprname in hit.cps]
+            for code in sorted(now - was):
+                newly_hit[name].append(_decode(code, hit.sizes, labels))
+            for code in sorted(was - now):
+                missed_again[name].append(_decode(code, old_sizes, labels))
+
+        return {
+            'newly_hit': {k: v for k, v in newly_hit.items() if v},
+            'missed_again': {k: v for k, v in missed_again.items() if v},
+        }
+
+def bin_states(cg):
+    # 每个bin的(命中次数, 排除标记数, 不可达标记数)和每个cc已覆盖组合的命中次数
+    # 没有任何命中和标记的cp/cc不计入，扣除test后留下的全0条目与全量合并结果视为一致
+    states = dict()
+    for exprname, hit in cg.cp_hit_data.items():
+        excl = hit.excl if hit.excl is not None else [0] * len(hit)
+        unreachable = hit.unreachable if hit.unreachable is not None else [0] * len(hit)
+        bins = {str(b): (int(h), int(e), int(u)) for b, h, e, u in zip(hit.bins, hit.hits, excl, unreachable)}
+        if any(any(state) for state in bins.values()):
+            states[exprname] = bins
+    for name, hit in cg.cc_hit_data.items():
+        hits = {code: n for code, n in hit.hits.items() if n}
+        if hits:
+            states[name] = hits
+    return states
+
+def _decode(code, sizes, labels):
+    vals = list()
+    for size, l in zip(reversed(sizes), reversed(labels)):
+        code, b = divmod(code, size)
+        vals.append(str(l[b]))
+    vals.reverse()
+    return tuple(vals)
+
+def print_delta(delta):
+    print(f"tests changed:{len(delta['tests_changed'])},removed:{len(delta['tests_removed'])}")
+    for title in ('newly_hit', 'missed_again'):
+        print(f"{title}:")
+        for key, vals in delta[title].items():
+            for val in vals:
+                if isinstance(val, tuple):
+                    val = f"<{', '.join(val)}>"
+                print(f"key:{key},val:{val}")
+
+if __name__ == '__main__':
+    import argparse
+    parser = argparse.ArgumentParser(description="增量跟踪regression的功能覆盖率收敛情况")
+    parser.add_argument('vdb', help='simv.vdb目录')
+    parser.add_argument('--state', required=True, help='保存上次合并状态的目录')
+    parser.add_argument('-j', '--workers', type=int, default=None, help='并行进程数，默认为CPU核数')
+    parser.add_argument('--cache', nargs='?', const=DEFAULT_CACHE_DIR, default=None, help='启用解析结果缓存，可指定缓存目录')
+    parser.add_argument('--verify', action='store_true', help='更新后与重新全量合并的结果比较，不一致时报错')
+    args = parser.parse_args()
+
+    cache = CoverageCache(args.cache) if args.cache else None
+    tracker = ClosureTracker(args.state, cache=cache)
+    print_delta(tracker.update(args.vdb, workers=args.workers))
+    if args.verify:
+        mismatched = tracker.verify(args.vdb, workers=args.workers)
+        if mismatched:
+            raise Exception('Closure state differs from a fresh merge:' + ','.join(mismatched[:10]))
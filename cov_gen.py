@@ -0,0 +1,116 @@
+import gzip
+import os
+import random
+
+# 交叉组合数超过该值时按密度随机采样已覆盖组合，不逐个枚举
+CROSS_ENUM_LIMIT = 1 << 20
+
+def generate(file, n_user=1000, n_auto=100, user_bins=16, auto_bins=10000, n_cross=100, cross_arity=2,
+             density=0.5, seed=0, gz=False):
+    # 生成与VCS cumulative.xml结构一致的合成覆盖率数据库：
+    # cg_src下为cp/cc定义，cg_covdef下为user cp的bn、auto_c cp的compact数据和cc的covered_auto_crosses
+    # 交叉在user cp之间随机选取cross_arity个，density为bin/交叉组合被命中的比例
+    # 返回(cp bin总数, 交叉组合总数)
+    rnd = random.Random(seed)
+    n_cp = n_user + n_auto
+    crosses = [rnd.sample(range(n_user), cross_arity) for _ in range(n_cross)] if n_user >= cross_arity else []
+
+    opener = gzip.open if gz else open
+    with opener(file, 'wt') as f:
+        f.write('<?xml version="1.0"?>\n<covdb>\n<cg_src name="bench::cg">\n')
+        for i in range(n_cp):
+            f.write(f'<cp id="{i}" exprname="cp_{i}" is_real="0"/>\n')
+        for i, cps in enumerate(crosses):
+            f.write(f'<cc id="{n_cp + i}" name="cc_{i}">')
+            f.write(''.join(f'<cp id="{cp}"/>' for cp in cps))
+            f.write('</cc>\n')
+
+        f.write('<cg_covdef>\n')
+        for i in range(n_user):
+            f.write(f'<cp type="user" id="{i}">\n')
+            for b in range(user_bins):
+                data = rnd.randint(1, 9) if rnd.random() < density else 0
+                excl = 1 if rnd.random() < 0.01 else 0
+                f.write(f'<bn id="{b}" name="bin_{b}" data="{data}" excl="{excl}" unreachable="0"/>\n')
+            f.write('</cp>\n')
+        for i in range(n_user, n_cp):
+            vals = ' '.join(str(rnd.randint(1, 9)) if rnd.random() < density else '0' for _ in range(auto_bins))
+            # 最后一个auto_c cp模拟宽位宽无符号的cp，命中值超出int64范围
+            base = (1 << 64) - auto_bins if i == n_cp - 1 else 0
+            index = ' '.join(str(base + b) for b in range(auto_bins))
+            f.write(f'<cp type="auto_c" id="{i}"><data type="compact" vals="{vals}" index="{index}"/></cp>\n')
+
+        total_cross = 0
+        for i, cps in enumerate(crosses):
+            total = user_bins ** cross_arity
+            total_cross += total
+            f.write(f'<cc id="{n_cp + i}"><covered_auto_crosses>\n')
+            _write_cross(f, _covered_codes(rnd, total, density), [user_bins] * cross_arity)
+            f.write('</covered_auto_crosses></cc>\n')
+        f.write('</cg_covdef>\n</cg_src>\n</covdb>\n')
+
+    return n_user * user_bins + n_auto * auto_bins, total_cross
+
+def _covered_codes(rnd, total, density):
+    if total <= CROSS_ENUM_LIMIT:
+        return [code for code in range(total) if rnd.random() < density]
+    return sorted(set(rnd.randrange(total) for _ in range(int(CROSS_ENUM_LIMIT * density))))
+
+def _write_cross(f, codes, sizes):
+    # 有序的组合编码按前缀逐层写成嵌套的cn_nt_s，最后一层为cn_t_s_d
+    depth = len(sizes)
+    opened = list()
+    for code in codes:
+        bins = list()
+        for size in reversed(sizes):
+            code, b = divmod(code, size)
+            bins.append(b)
+        bins.reverse()
+
+        # 关闭与当前组合前缀不同的层
+        same = 0
+        while same < len(opened) and opened[same] == bins[same]:
+            same += 1
+        for _ in range(len(opened) - same):
+            f.write('</cn_nt_s>')
+        del opened[same:]
+
+        for level in range(same, depth - 1):
+            f.write(f'<cn_nt_s val="{bins[level]}">')
+            opened.append(bins[level])
+        f.write(f'<cn_t_s_d val="{bins[-1]}" data="1"/>\n')
+    f.write('</cn_nt_s>' * len(opened))
+
+def generate_vdb(vdb, n_tests=8, seed=0, **kwargs):
+    # 按regression目录结构生成多个test：<vdb>/snps/coverage/db/testdata/test_<i>/testbench.cumulative.xml
+    files = list()
+    for i in range(n_tests):
+        test_dir = os.path.join(vdb, 'snps', 'coverage', 'db', 'testdata', f'test_{i}')
+        os.makedirs(test_dir, exist_ok=True)
+        file = os.path.join(test_dir, 'testbench.cumulative.xml')
+        generate(file, seed=seed + i, **kwargs)
+        files.append(file)
+    return files
+
+if __name__ == '__main__':
+    import argparse
+    parser = argparse.ArgumentParser(description="生成合成的VCS功能覆盖率xml")
+    parser.add_argument('output', help='输出xml路径；指定--tests时为simv.vdb目录')
+    parser.add_argument('--user', type=int, default=1000, help='user cp个数')
+    parser.add_argument('--auto', type=int, default=100, help='auto_c cp个数')
+    parser.add_argument('--user-bins', type=int, default=16, help='每个user cp的bin数')
+    parser.add_argument('--auto-bins', type=int, default=10000, help='每个auto_c cp的bin数')
+    parser.add_argument('--cross', type=int, default=100, help='cc个数')
+    parser.add_argument('--arity', type=int, default=2, help='每个cc交叉的cp个数')
+    parser.add_argument('--density', type=float, default=0.5, help='bin命中比例')
+    parser.add_argument('--seed', type=int, default=0, help='随机种子')
+    parser.add_argument('--gz', action='store_true', help='输出gzip压缩的xml')
+    parser.add_argument('--tests', type=int, default=None, help='生成regression目录结构，包含指定个数的test')
+    args = parser.parse_args()
+
+    kwargs = dict(n_user=args.user, n_auto=args.auto, user_bins=args.user_bins, auto_bins=args.auto_bins,
+                  n_cross=args.cross, cross_arity=args.arity, density=args.density, gz=args.gz)
+    if args.tests:
+        generate_vdb(args.output, n_tests=args.tests, seed=args.seed, **kwargs)
+    else:
+        generate(args.output, seed=args.seed, **kwargs)
@@ -0,0 +1,183 @@
+import os
+from array import array
+from bisect import bisect_left, bisect_right
+from collections import defaultdict
+from fnmatch import fnmatchcase
+
+from cov_cache import CoverageCache, DEFAULT_CACHE_DIR
+from vcs_cg import merge, parse_cached, np
+
+# bin标记位
+FLAG_EXCL = 1
+FLAG_UNREACHABLE = 2
+FLAG_MISSED = 4
+
+class CoverageIndex(object):
+    # 在解析结果上预建索引，按covergroup、coverpoint名(glob)、命中次数范围、排除/不可达、是否漏覆盖查询bin
+    # 所有cp的bin按cp名排序后连续编号，同一个cp的bin编号连续，cp过滤直接得到编号区间
+    def __init__(self, cg):
+        self.names = sorted(cg.cp_hit_data)
+        self.records = [cg.cp_hit_data[name] for name in self.names]
+
+        self.starts = array('q')
+        total = 0
+        for hit in self.records:
+            self.starts.append(total)
+            total += len(hit)
+        self.total = total
+
+        # covergroup -> cp序号
+        cg_of = {define['exprname']: define.get('cg') for define in cg.cp_define_data.values()}
+        self.by_cg = defaultdict(list)
+        for i, name in enumerate(self.names):
+            self.by_cg[cg_of.get(name)].append(i)
+
+        # 按bin编号的命中次数列和标记列
+        self.hits = array('q')
+        self.flags = bytearray(total)
+        for i, hit in enumerate(self.records):
+            start = self.starts[i]
+            if np is not None and isinstance(hit.hits, np.ndarray):
+                self.hits.frombytes(hit.hits.astype(np.int64).tobytes())
+            else:
+                self.hits.extend(int(h) for h in hit.hits)
+            for j in range(len(hit)):
+                flag = 0
+                if hit.excl is not None and hit.excl[j]:
+                    flag |= FLAG_EXCL
+                if hit.unreachable is not None and hit.unreachable[j]:
+                    flag |= FLAG_UNREACHABLE
+                if self.hits[start + j] == 0 and not flag & FLAG_EXCL:
+                    flag |= FLAG_MISSED
+                self.flags[start + j] = flag
+
+        # 每种标记的有序bin编号列表
+        self.by_flag = dict()
+        for flag in (FLAG_EXCL, FLAG_UNREACHABLE, FLAG_MISSED):
+            self.by_flag[flag] = array('q', (i for i, f in enumerate(self.flags) if f & flag))
+
+        # 按命中次数排序的bin编号，命中次数范围查询用二分
+        if np is not None:
+            order = np.argsort(np.frombuffer(self.hits, dtype=np.int64), kind='stable')
+            self.by_hits = array('q', order.astype(np.int64).tobytes())
+        else:
+            self.by_hits = array('q', sorted(range(total), key=self.hits.__getitem__))
+        self.sorted_hits = array('q', (self.hits[i] for i in self.by_hits))
+
+        self._glob_cache = dict()
+
+    def match_cps(self, cg=None, cp=None):
+        # 返回满足covergroup和cp名glob的cp序号
+        if cp is None:
+            cps = range(len(self.names))
+        elif cp in self._glob_cache:
+            cps = self._glob_cache[cp]
+        else:
+            # glob的字面前缀在有序名字上二分，只对前缀相同的名字做匹配
+            prefix = cp
+            for i, c in enumerate(cp):
+                if c in '*?[':
+                    prefix = cp[:i]
+                    break
+            cps = list()
+            for i in range(bisect_left(self.names, prefix), len(self.names)):
+                name = self.names[i]
+                if not name.startswith(prefix):
+                    break
+                if fnmatchcase(name, cp):
+                    cps.append(i)
+            self._glob_cache[cp] = cps
+
+        if cg is not None:
+            in_cg = set(self.by_cg.get(cg, ()))
+            cps = [i for i in cps if i in in_cg]
+        return cps
+
+    def query(self, cg=None, cp=None, min_hits=None, max_hits=None, excl=None, unreachable=None, missed=None):
+        # 各条件为None时不过滤，标记条件为True/False时要求bin有/没有该标记
+        flags = [(flag, want) for flag, want in ((FLAG_EXCL, excl), (FLAG_UNREACHABLE, unreachable), (FLAG_MISSED, missed))
+                 if want is not None]
+        required = [flag for flag, want in flags if want]
+
+        # 选择候选集最小的索引作为起点，其余条件逐个bin O(1)检查
+        if cg is not None or cp is not None:
+            ids = list()
+            for i in self.match_cps(cg, cp):
+                start = self.starts[i]
+                end = start + len(self.records[i])
+                if required:
+                    sorted_ids = self.by_flag[required[0]]
+                    ids.extend(sorted_ids[bisect_left(sorted_ids, start):bisect_left(sorted_ids, end)])
+                else:
+                    ids.extend(range(start, end))
+        elif required:
+            ids = min((self.by_flag[flag] for flag in required), key=len)
+        elif min_hits is not None or max_hits is not None:
+            lo = 0 if min_hits is None else bisect_left(self.sorted_hits, min_hits)
+            hi = len(self.sorted_hits) if max_hits is None else bisect_right(self.sorted_hits, max_hits)
+            ids = sorted(self.by_hits[lo:hi])
+        else:
+            ids = range(self.total)
+
+        result = array('q')
+        for i in ids:
+            h = self.hits[i]
+            if min_hits is not None and h < min_hits:
+                continue
+            if max_hits is not None and h > max_hits:
+                continue
+            f = self.flags[i]
+            if any(bool(f & flag) != want for flag, want in flags):
+                continue
+            result.append(i)
+        return QueryResult(self, result)
+
+    def locate(self, i):
+        # bin编号 -> (cp序号, cp内的bin序号)
+        cp = bisect_right(self.starts, i) - 1
+        return cp, i - self.starts[cp]
+
+class QueryResult(object):
+    # 查询结果只保存bin编号，迭代时按需生成dict
+    __slots__ = ('index', 'ids')
+
+    def __init__(self, index, ids):
+        self.index = index
+        self.ids = ids
+
+    def __len__(self):
+        return len(self.ids)
+
+    def __iter__(self):
+        index = self.index
+        for i in self.ids:
+            cp, j = index.locate(i)
+            hit = index.records[cp]
+            yield {'cp': index.names[cp], 'val': str(hit.bins[j]), 'hits': index.hits[i], 'type': hit.type}
+
+if __name__ == '__main__':
+    import argparse
+    parser = argparse.ArgumentParser(description="查询覆盖率bin")
+    parser.add_argument('file', help='testbench.cumulative.xml路径，或simv.vdb目录(合并所有test)')
+    parser.add_argument('--cg', default=None, help='covergroup名')
+    parser.add_argument('--cp', default=None, help='coverpoint名，支持glob')
+    parser.add_argument('--min-hits', type=int, default=None, help='最小命中次数')
+    parser.add_argument('--max-hits', type=int, default=None, help='最大命中次数')
+    parser.add_argument('--missed', action='store_true', help='只查询漏覆盖的bin')
+    parser.add_argument('--excl', action='store_true', help='只查询被排除的bin')
+    parser.add_argument('--unreachable', action='store_true', help='只查询不可达的bin')
+    parser.add_argument('-j', '--workers', type=int, default=None, help='合并时的并行进程数，默认为CPU核数')
+    parser.add_argument('--cache', nargs='?', const=DEFAULT_CACHE_DIR, default=None, help='启用解析结果缓存，可指定缓存目录')
+    args = parser.parse_args()
+
+    cache = CoverageCache(args.cache) if args.cache else None
+    if os.path.isdir(args.file):
+        cg = merge(args.file, workers=args.workers, cache=cache)
+    else:
+        cg = parse_cached(args.file, cache)
+
+    index = CoverageIndex(cg)
+    result = index.query(cg=args.cg, cp=args.cp, min_hits=args.min_hits, max_hits=args.max_hits,
+                         excl=args.excl or None, unreachable=args.unreachable or None, missed=args.missed or None)
+    for val in result:
+        print(f"key:{val['cp']},val:{val['val']},hits:{val['hits']},type:{val['type']}")
@@ -0,0 +1,68 @@
+import hashlib
+import os
+
+DEFAULT_MAX_BYTES = 1 << 30
+
+class DiskCache(object):
+    # 各磁盘缓存共用的部分：按源文件生成key、缓存文件路径、按LRU淘汰和清空
+    # 以文件路径/大小/mtime(可选再加内容hash)为key，源文件变化后key随之变化，旧条目按LRU淘汰
+    # 子类设置suffix，并实现load/store
+    suffix = ''
+
+    def __init__(self, cache_dir, max_bytes=DEFAULT_MAX_BYTES, use_hash=False):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.use_hash = use_hash
+
+    def key(self, files):
+        # 单个文件或文件列表对应的key
+        if isinstance(files, str):
+            files = [files]
+        h = hashlib.sha1()
+        for file in files:
+            st = os.stat(file)
+            h.update(f'{os.path.abspath(file)}\0{st.st_size}\0{st.st_mtime_ns}\0'.encode())
+            if self.use_hash:
+                with open(file, 'rb') as f:
+                    for block in iter(lambda: f.read(1 << 20), b''):
+                        h.update(block)
+        return h.hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, key + self.suffix)
+
+    def touch(self, path):
+        # 命中后更新访问时间用于LRU
+        os.utime(path)
+
+    def evict(self):
+        # 总大小超过上限时，按最近访问时间从旧到新删除
+        entries = list()
+        total = 0
+        for entry in os.scandir(self.cache_dir):
+            if not entry.name.endswith(self.suffix):
+                continue
+            try:
+                st = entry.stat()
+            except FileNotFoundError:
+                continue
+            entries.append((st.st_mtime, st.st_size, entry.path))
+            total += st.st_size
+
+        entries.sort()
+        for _, size, path in entries:
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                # 已被删除，或在Windows下仍被mmap打开
+                pass
+            total -= size
+
+    def clear(self):
+        if not os.path.isdir(self.cache_dir):
+            return
+        for entry in os.scandir(self.cache_dir):
+            if entry.name.endswith(self.suffix):
+                os.remove(entry.path)
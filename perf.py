@@ -0,0 +1,157 @@
+import atexit
+import json
+import multiprocessing
+import os
+import sys
+import threading
+import time
+from collections import defaultdict
+
+# 可选依赖：resource用于读取峰值内存，Windows下没有
+try:
+    import resource
+except ImportError:
+    resource = None
+
+# 各工具共用的性能统计：阶段计时、峰值内存和计数器，默认关闭
+# FUNC_COV_PERF=文件路径 时以JSON行追加写入，-为标准错误；FUNC_COV_PROFILE=文件路径 时用cProfile采样主进程
+# 关闭时phase()返回共享的空对象，count()只做一次判断，不影响热点路径
+PERF_LOG = os.environ.get('FUNC_COV_PERF', '')
+PERF_PROFILE = os.environ.get('FUNC_COV_PROFILE', '')
+
+enabled = False
+counters = defaultdict(int)
+
+_lock = threading.Lock()
+_log = None
+_profiler = None
+_profile_path = None
+
+def enable(log='-', profile=None):
+    # log为JSON行输出路径，-为标准错误，None时不输出；profile为cProfile结果(pstats格式)的输出路径
+    global enabled, _log, _profiler, _profile_path
+    if not enabled:
+        atexit.register(flush)
+    enabled = True
+    _log = log
+    if profile and _profiler is None:
+        import cProfile
+        _profile_path = profile
+        _profiler = cProfile.Profile()
+        _profiler.enable()
+
+def peak_rss_mb():
+    # 进程的峰值常驻内存(MB)，取不到时返回None
+    if resource is None:
+        return None
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux下单位为KB，macOS下为字节
+    return round(rss / (1 << 20 if sys.platform == 'darwin' else 1 << 10), 1)
+
+def emit(event, **fields):
+    # 写一条JSON记录；多个进程追加写同一个文件，每条记录一次写入
+    if not enabled or _log is None:
+        return
+    record = {'event': event, 'time': round(time.time(), 3), 'pid': os.getpid()}
+    record.update(fields)
+    line = json.dumps(record, ensure_ascii=False, default=str) + '\n'
+    with _lock:
+        if _log == '-':
+            sys.stderr.write(line)
+        else:
+            with open(_log, 'a', encoding='utf-8') as f:
+                f.write(line)
+
+def count(name, n=1):
+    # 累加进程级计数器，退出时随summary输出
+    if enabled:
+        with _lock:
+            counters[name] += n
+
+class Phase(object):
+    # 一个阶段的耗时、CPU时间和峰值内存，count()记录阶段内的计数，输出时附带每秒速率
+    def __init__(self, name, fields):
+        self.name = name
+        self.fields = fields
+        self.counts = defaultdict(int)
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        self.cpu = time.process_time()
+        return self
+
+    def count(self, name, n=1):
+        self.counts[name] += n
+
+    def __exit__(self, exc_type, exc, tb):
+        seconds = time.perf_counter() - self.start
+        record = dict(self.fields)
+        record['seconds'] = round(seconds, 6)
+        record['cpu'] = round(time.process_time() - self.cpu, 6)
+        record['peak_rss_mb'] = peak_rss_mb()
+        for name, n in self.counts.items():
+            record[name] = n
+            if seconds > 0:
+                record[name + '_per_s'] = round(n / seconds, 1)
+            count(name, n)
+        if exc_type is not None:
+            record['error'] = exc_type.__name__
+        emit('phase', name=self.name, **record)
+        return False
+
+class NullPhase(object):
+    # 关闭时使用的空阶段
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+    def count(self, name, n=1):
+        pass
+
+NULL_PHASE = NullPhase()
+
+def phase(name, **fields):
+    # with perf.phase('名字', 附加字段) as p: ... p.count('rows', n)
+    if not enabled:
+        return NULL_PHASE
+    return Phase(name, fields)
+
+def flush():
+    # 输出计数器汇总，并保存cProfile结果
+    global _profiler
+    if not enabled:
+        return
+    with _lock:
+        totals = dict(counters)
+    emit('summary', counters=totals, peak_rss_mb=peak_rss_mb())
+    if _profiler is not None:
+        _profiler.disable()
+        _profiler.dump_stats(_profile_path)
+        _profiler = None
+
+def _after_fork():
+    # fork出的子进程不继承cProfile采样，其结果也不会被保存
+    global _profiler
+    if _profiler is not None:
+        _profiler.disable()
+        _profiler = None
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_after_fork)
+
+def add_arguments(parser):
+    # 各工具命令行共用的选项；--perf不带参数，避免把后面的位置参数当作输出文件
+    parser.add_argument('--perf', action='store_true', help='在标准错误输出性能统计(JSON行)')
+    parser.add_argument('--perf-log', default=None, help='把性能统计(JSON行)追加写入该文件')
+    parser.add_argument('--profile', default=None, help='用cProfile采样并把结果保存到该文件')
+
+def enable_from_args(args):
+    log = args.perf_log or ('-' if args.perf else None)
+    if log or args.profile:
+        enable(log or PERF_LOG or None, args.profile or PERF_PROFILE or None)
+
+# 多进程解析时子进程继承环境变量，同样输出阶段统计；cProfile只在主进程中开启
+if PERF_LOG or PERF_PROFILE:
+    enable(PERF_LOG or None, PERF_PROFILE if multiprocessing.parent_process() is None else None)
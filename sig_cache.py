@@ -0,0 +1,133 @@
+import mmap
+import os
+import struct
+import tempfile
+import zlib
+from array import array
+
+from disk_cache import DiskCache, DEFAULT_MAX_BYTES
+
+MAPPING_MAGIC = b'SIGM'
+MAPPING_VERSION = 1
+MAPPING_SUFFIX = '.sigm'
+
+DEFAULT_CACHE_DIR = os.environ.get('SIG_MAPPING_CACHE', os.path.join(os.path.expanduser('~'), '.cache', 'sig_mapping'))
+
+# 头部：magic + 版本 + key(sha1) + 条目数 + hash表槽数，补齐到64字节使槽数组对齐
+HEADER = struct.Struct('<4sB40sQQ3x')
+# 条目：前仿路径长度 + 后仿路径长度，后接两个路径的utf-8字节
+ENTRY = struct.Struct('<II')
+
+class MappingCache(DiskCache):
+    # 编译后的映射索引的磁盘缓存
+    # 以tcl文件列表的路径/大小/mtime为key，任一文件变化后key随之变化，旧条目按LRU淘汰
+    # 缓存文件为开放寻址的hash表，加载时只做mmap，查找直接在文件中进行，与条目数无关
+    suffix = MAPPING_SUFFIX
+
+    def __init__(self, cache_dir=DEFAULT_CACHE_DIR, max_bytes=DEFAULT_MAX_BYTES):
+        DiskCache.__init__(self, cache_dir, max_bytes)
+
+    def load(self, files):
+        # 命中时返回CompiledMapping，否则返回None
+        key = self.key(files)
+        path = self._path(key)
+        mapping = read_file(path, key)
+        if mapping is not None:
+            self.touch(path)
+        return mapping
+
+    def store(self, files, mapping):
+        os.makedirs(self.cache_dir, exist_ok=True)
+        key = self.key(files)
+        write_file(self._path(key), mapping, key)
+        self.evict()
+
+class CompiledMapping(object):
+    # 只读的 前仿路径 -> 后仿路径 映射，与dict的get/len/in接口一致
+    # 布局：头部 + 槽数个uint64(条目偏移+1，0为空槽，本机字节序) + 条目；槽位为crc32(前仿路径)，冲突时线性探测
+    def __init__(self, path):
+        self.slots = None
+        self.file = open(path, 'rb')
+        self.mm = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, self.key, self.n, n_slots = HEADER.unpack_from(self.mm)
+        if magic != MAPPING_MAGIC or version != MAPPING_VERSION:
+            self.close()
+            raise Exception('Bad mapping cache:' + path)
+        self.mask = n_slots - 1
+        self.slots = memoryview(self.mm)[HEADER.size:HEADER.size + 8 * n_slots].cast('Q')
+        self.entries = HEADER.size + 8 * n_slots
+
+    def __len__(self):
+        return self.n
+
+    def get(self, pre, default=None):
+        key = pre.encode()
+        mm = self.mm
+        i = zlib.crc32(key) & self.mask
+        while True:
+            slot = self.slots[i]
+            if not slot:
+                return default
+            offset = self.entries + slot - 1
+            pre_len, post_len = ENTRY.unpack_from(mm, offset)
+            offset += ENTRY.size
+            if pre_len == len(key) and mm[offset:offset + pre_len] == key:
+                return mm[offset + pre_len:offset + pre_len + post_len].decode()
+            i = (i + 1) & self.mask
+
+    def __contains__(self, pre):
+        return self.get(pre) is not None
+
+    def items(self):
+        offset = self.entries
+        for _ in range(self.n):
+            pre_len, post_len = ENTRY.unpack_from(self.mm, offset)
+            offset += ENTRY.size
+            yield self.mm[offset:offset + pre_len].decode(), self.mm[offset + pre_len:offset + pre_len + post_len].decode()
+            offset += pre_len + post_len
+
+    def close(self):
+        if self.slots is not None:
+            self.slots.release()
+            self.slots = None
+        self.mm.close()
+        self.file.close()
+
+def read_file(path, key=None):
+    # 文件不存在、格式不符或key不一致时返回None
+    try:
+        mapping = CompiledMapping(path)
+    except Exception:
+        return None
+    if key is not None and mapping.key.decode().rstrip() != key:
+        mapping.close()
+        return None
+    return mapping
+
+def write_file(path, mapping, key=''):
+    # 槽数为不小于条目数2倍的2的幂，保持探测链较短
+    n_slots = 1
+    while n_slots < 2 * len(mapping):
+        n_slots <<= 1
+    mask = n_slots - 1
+    slots = array('Q', bytes(8 * n_slots))
+    entries = bytearray()
+    for pre, post in mapping.items():
+        pre = pre.encode()
+        post = post.encode()
+        i = zlib.crc32(pre) & mask
+        while slots[i]:
+            i = (i + 1) & mask
+        slots[i] = len(entries) + 1
+        entries += ENTRY.pack(len(pre), len(post))
+        entries += pre
+        entries += post
+
+    header = HEADER.pack(MAPPING_MAGIC, MAPPING_VERSION, key.encode().ljust(40), len(mapping), n_slots)
+    # 先写临时文件再改名，避免并发读到写了一半的文件
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path) or '.', suffix='.tmp')
+    with os.fdopen(fd, 'wb') as f:
+        f.write(header)
+        f.write(slots.tobytes())
+        f.write(entries)
+    os.replace(tmp, path)
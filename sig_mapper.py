@@ -0,0 +1,349 @@
+import configparser
+import multiprocessing
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+
+import perf
+
+# tcl文件总大小超过该值时才用多进程解析，文件少时进程启动的开销更大
+PARALLEL_MIN_BYTES = 16 << 20
+
+# 转换结果的LRU缓存大小，反复拖入同一组信号时直接命中
+MEMO_SIZE = 1 << 16
+# 总线范围sig[msb:lsb]整体没有匹配时逐位转换，超过该位数不展开
+BUS_EXPAND_LIMIT = 4096
+BUS_RE = re.compile(r'^(.*)\[(\d+):(\d+)\]$')
+# 规则中正则和替换模板的分隔符
+RULE_SEP = '=>'
+
+# 层次路径的分隔符，verdi中为.，部分工具为/
+SEPARATORS = './'
+
+# tcl中的一个词：{...}、"..."或不含空白的字符串
+TCL_WORD_RE = re.compile(r'\{([^{}]*)\}|"((?:[^"\\]|\\.)*)"|(\S+)')
+# set 数组名(前仿路径) 后仿路径
+TCL_SET_RE = re.compile(r'^[\w:]+\((.+)\)$')
+
+def tcl_files(path):
+    # path为tcl文件夹或;分隔的tcl文件列表，文件夹下递归查找*.tcl
+    files = list()
+    for item in path.split(';'):
+        item = item.strip()
+        if not item:
+            continue
+        if os.path.isdir(item):
+            for root, dirs, names in os.walk(item):
+                dirs.sort()
+                files.extend(os.path.join(root, name) for name in sorted(names) if name.endswith('.tcl'))
+        elif os.path.isfile(item):
+            files.append(item)
+        else:
+            raise Exception('Mapping file not found:' + item)
+    return files
+
+def tcl_words(line):
+    return [m.group(1) if m.group(1) is not None else m.group(2) if m.group(2) is not None else m.group(3)
+            for m in TCL_WORD_RE.finditer(line)]
+
+def parse_tcl(file):
+    # 逐行解析映射文件，生成(前仿路径, 后仿路径)，支持以下写法：
+    #   命令 前仿路径 后仿路径      如 map_signal a.b.c a.b_c
+    #   set 数组名(前仿路径) 后仿路径
+    #   前仿路径 后仿路径
+    # #开头为注释，行尾\续行，行尾;忽略
+    with open(file) as f:
+        pending = ''
+        for line in f:
+            line = line.strip()
+            if line.endswith('\\'):
+                pending += line[:-1] + ' '
+                continue
+            line = (pending + line).rstrip(';').strip()
+            pending = ''
+            if not line or line[0] == '#':
+                continue
+            words = tcl_words(line) if '{' in line or '"' in line else line.split()
+            if len(words) == 3 and words[0] == 'set':
+                m = TCL_SET_RE.match(words[1])
+                if m:
+                    yield m.group(1), words[2]
+            elif len(words) == 3:
+                yield words[1], words[2]
+            elif len(words) == 2:
+                yield words[0], words[1]
+
+def prefix_ends(path):
+    # path在层次边界处的前缀长度，从长到短；末尾的位选择[...]也作为边界
+    ends = [len(path)]
+    last_sep = max(path.rfind(sep) for sep in SEPARATORS)
+    if path.endswith(']'):
+        i = path.rfind('[')
+        if i > last_sep + 1:
+            ends.append(i)
+    for i in range(last_sep, 0, -1):
+        if path[i] in SEPARATORS:
+            ends.append(i)
+    return ends
+
+def replace_prefix(path, prefix, target):
+    # prefix在层次边界处匹配时替换为target，否则返回None
+    if not prefix or not path.startswith(prefix):
+        return None
+    if len(path) > len(prefix) and path[len(prefix)] not in SEPARATORS:
+        return None
+    return target + path[len(prefix):]
+
+def _parse_files(files):
+    mapping = dict()
+    for file in files:
+        mapping.update(parse_tcl(file))
+    return mapping
+
+def load_mapping(files, workers=None, cache=None, progress=None, cancelled=None):
+    # 多进程解析所有tcl文件并合并为一个映射索引，后面的文件覆盖前面文件中相同的前仿路径
+    # cache为sig_cache.MappingCache时，文件列表和mtime都没变化直接打开编译好的索引，不再解析tcl
+    # progress(已解析文件数, 文件总数)用于报告进度；cancelled()返回True时停止解析并返回None
+    with perf.phase('sig_mapping.load', files=len(files)) as p:
+        index = _load_mapping(files, workers, cache, progress, cancelled, p)
+        if index is not None:
+            p.count('mappings', len(index))
+    return index
+
+def _load_mapping(files, workers, cache, progress, cancelled, p):
+    index = MappingIndex()
+    if cache is not None:
+        mapping = cache.load(files)
+        if mapping is not None:
+            p.count('cache_hits')
+            index.map = mapping
+            return index
+
+    workers = workers or os.cpu_count() or 1
+    if workers == 1 or len(files) < 2 or sum(os.path.getsize(file) for file in files) < PARALLEL_MIN_BYTES:
+        for i, file in enumerate(files):
+            if cancelled is not None and cancelled():
+                return None
+            index.update(parse_tcl(file))
+            if progress is not None:
+                progress(i + 1, len(files))
+    else:
+        # 连续的文件分为一块，按顺序合并以保持覆盖顺序
+        n_chunks = min(len(files), workers * 4)
+        size = (len(files) + n_chunks - 1) // n_chunks
+        chunks = [files[i:i + size] for i in range(0, len(files), size)]
+        # 图形界面在QThreadPool的线程中加载，多线程的进程中fork可能死锁，子进程用spawn启动
+        with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn')) as pool:
+            futures = [pool.submit(_parse_files, chunk) for chunk in chunks]
+            done = 0
+            for future, chunk in zip(futures, chunks):
+                if cancelled is not None and cancelled():
+                    for other in futures:
+                        other.cancel()
+                    return None
+                index.update(future.result())
+                done += len(chunk)
+                if progress is not None:
+                    progress(done, len(files))
+
+    if cache is not None:
+        cache.store(files, index.map)
+    return index
+
+class MappingIndex(object):
+    # 前仿层次路径(模块实例或信号) -> 后仿路径的前缀索引
+    # 查找时从最长的层次前缀开始逐级缩短，命中的前缀替换为后仿路径，其余部分保留，O(层次深度)
+    def __init__(self):
+        self.map = dict()
+
+    def __len__(self):
+        return len(self.map)
+
+    def add(self, pre, post):
+        self.map[pre] = post
+
+    def update(self, pairs):
+        self.map.update(pairs)
+
+    def lookup(self, path):
+        # 返回映射后的路径，没有匹配的前缀时返回None
+        get = self.map.get
+        for end in prefix_ends(path):
+            post = get(path[:end])
+            if post is not None:
+                return post + path[end:]
+        return None
+
+class RulePipeline(object):
+    # 网表改名规则：有序的(名字, 正则, 替换模板)，依次作用在路径上，模板语法同re.sub
+    # 如位选择展开 (\w+)\[(\d+)\]$ => \1_\2_，层次压平 ^(u_\w+)\.(\w+)$ => \1_\2
+    def __init__(self, rules=()):
+        self.rules = list()
+        for name, pattern, template in rules:
+            try:
+                self.rules.append((name, re.compile(pattern), template))
+            except re.error as e:
+                raise Exception(f'Bad rule {name}: {e}')
+
+    def __len__(self):
+        return len(self.rules)
+
+    def apply(self, path):
+        # 返回(改名后的路径, 是否有规则生效)
+        changed = False
+        for name, regex, template in self.rules:
+            path, n = regex.subn(template, path)
+            if n:
+                changed = True
+        return path, changed
+
+def parse_rules(items):
+    # items为(名字, '正则 => 替换模板')，如配置文件[Rules]段的条目
+    rules = list()
+    for name, value in items:
+        if RULE_SEP not in value:
+            raise Exception('Bad rule:' + name)
+        pattern, template = value.rsplit(RULE_SEP, 1)
+        rules.append((name, pattern.strip(), template.strip()))
+    return RulePipeline(rules)
+
+def read_rules(config_file='config.ini'):
+    # 配置文件[Rules]段中按顺序排列的规则，每条为 名字 = 正则 => 替换模板；规则中常有%，不做插值
+    config = configparser.ConfigParser(interpolation=None)
+    config.read(config_file)
+    if 'Rules' not in config:
+        return RulePipeline()
+    return parse_rules(config['Rules'].items())
+
+class SignalMapper(object):
+    # 前仿信号 -> 后仿信号：先查映射文件；没有匹配时，若启用了hdl_path前缀替换，
+    # 把原始前缀下的相对路径再查一次映射，仍没有匹配时依次应用改名规则，最后把原始前缀替换为目标前缀
+    # 转换结果按路径做LRU缓存，映射、前缀或规则变化时需要新建SignalMapper
+    def __init__(self, index=None, original_prefix=None, target_prefix=None, rules=None, memo_size=MEMO_SIZE):
+        self.index = index if index is not None else MappingIndex()
+        self.original_prefix = original_prefix
+        self.target_prefix = target_prefix
+        self.rules = rules if rules is not None else RulePipeline()
+        self._memo = lru_cache(maxsize=memo_size)(self._translate) if memo_size else self._translate
+
+    def translate(self, path):
+        # 返回(后仿路径, 是否匹配)，没有匹配时原样返回；总线逐位展开时返回空格分隔的多个信号
+        return self._memo(path)
+
+    def _translate(self, path):
+        post = self._lookup(path)
+        if post is not None:
+            return post, True
+        # 没有匹配的总线范围逐位转换，如sig[3:0]的各位被展开为sig_3_ ... sig_0_
+        # 每一位与单独拖入时一样先查完整路径，再查前缀下的相对路径和改名规则
+        m = BUS_RE.match(path)
+        if m:
+            msb, lsb = int(m.group(2)), int(m.group(3))
+            if abs(msb - lsb) < BUS_EXPAND_LIMIT:
+                step = -1 if msb >= lsb else 1
+                bits = [self._lookup(f'{m.group(1)}[{i}]') for i in range(msb, lsb + step, step)]
+                if all(post is not None for post in bits):
+                    return ' '.join(bits), True
+        # 原始前缀下的相对路径没有映射和规则匹配时原样保留，只替换前缀
+        if self.original_prefix:
+            rest = replace_prefix(path, self.original_prefix, '')
+            if rest is not None:
+                return self.target_prefix + rest, True
+        return path, False
+
+    def _lookup(self, path):
+        # 单个路径的映射结果，没有匹配时返回None：先查完整路径的映射；
+        # 启用了hdl_path前缀替换且路径在原始前缀下时，再查相对路径的映射和改名规则，结果加上目标前缀
+        post = self.index.lookup(path)
+        if post is not None:
+            return post
+        if self.original_prefix:
+            rest = replace_prefix(path, self.original_prefix, '')
+            if rest is not None:
+                # rest为空或以分隔符开头
+                if not rest:
+                    return self.target_prefix
+                post = self._rename(rest[1:])
+                if post is None:
+                    return None
+                return ' '.join(self.target_prefix + rest[0] + signal for signal in post.split(' '))
+        return self._rename(path)
+
+    def _rename(self, path):
+        # 查映射，没有匹配时依次应用改名规则，都没有匹配时返回None
+        post = self.index.lookup(path)
+        if post is not None:
+            return post
+        post, changed = self.rules.apply(path)
+        return post if changed else None
+
+    def translate_text(self, text):
+        # 批量转换拖入的文本，信号之间的空白原样保留
+        # 返回(转换后的文本, 没有匹配的信号列表)
+        parts = re.split(r'(\s+)', text)
+        memo = dict()
+        unmatched = list()
+        for i in range(0, len(parts), 2):
+            signal = parts[i]
+            if not signal:
+                continue
+            if signal not in memo:
+                memo[signal] = self.translate(signal)
+                if not memo[signal][1]:
+                    unmatched.append(signal)
+            parts[i] = memo[signal][0]
+        return ''.join(parts), unmatched
+
+    def translate_slash(self, path):
+        # verdi .rc中的信号路径为/分隔的绝对路径，转换为.分隔后查映射，再转换回去
+        if not path.startswith('/'):
+            return self.translate(path)
+        post, matched = self.translate(path[1:].replace('/', '.'))
+        return ' '.join('/' + signal.replace('.', '/') for signal in post.split(' ')), matched
+
+def translate_rc(lines, mapper, unmatched=None, waveforms=None):
+    # 逐行转换verdi信号文件(.rc)：addSignal行中/开头的信号路径按映射转换，其余行原样输出
+    # waveforms为(前仿fsdb, 后仿fsdb)时把行中的前仿波形路径替换为后仿波形路径
+    # unmatched为列表时追加没有匹配的信号
+    for line in lines:
+        stripped = line.lstrip()
+        if stripped.startswith('addSignal'):
+            parts = re.split(r'(\s+)', line)
+            for i in range(2, len(parts), 2):
+                if parts[i].startswith('/'):
+                    parts[i], matched = mapper.translate_slash(parts[i])
+                    if not matched and unmatched is not None:
+                        unmatched.append(parts[i])
+            line = ''.join(parts)
+        elif waveforms and waveforms[0] and waveforms[1] and waveforms[0] in line:
+            line = line.replace(waveforms[0], waveforms[1])
+        yield line
+
+def translate_lines(lines, mapper, unmatched=None):
+    # 逐行转换信号列表，每行可以有多个空白分隔的信号
+    for line in lines:
+        post, missed = mapper.translate_text(line)
+        if unmatched is not None:
+            unmatched.extend(missed)
+        yield post
+
+def translate_file(src, dst, mapper, fmt=None, waveforms=None):
+    # 流式转换文件，src/dst为路径或已打开的文件对象；fmt为'rc'或'list'，默认按扩展名判断
+    # 返回没有匹配的信号列表
+    if fmt is None:
+        fmt = 'rc' if isinstance(src, str) and src.endswith('.rc') else 'list'
+    unmatched = list()
+    fin = open(src) if isinstance(src, str) else src
+    fout = open(dst, 'w') if isinstance(dst, str) else dst
+    try:
+        if fmt == 'rc':
+            fout.writelines(translate_rc(fin, mapper, unmatched, waveforms))
+        else:
+            fout.writelines(translate_lines(fin, mapper, unmatched))
+    finally:
+        if fin is not src:
+            fin.close()
+        if fout is not dst:
+            fout.close()
+    return unmatched
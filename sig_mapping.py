@@ -1,16 +1,12 @@
 import sys
-from PyQt5.QtWidgets import (
-    QApplication, QMainWindow, QLabel, QVBoxLayout, QHBoxLayout,
-    QFrame, QPushButton, QTextEdit, QCheckBox, QLineEdit, QFileDialog,
-    QTabWidget, QWidget, QGroupBox, QGridLayout, QSizePolicy, QScrollArea, QMessageBox
-)
-from PyQt5.QtCore import Qt, QMimeData
-from PyQt5.QtGui import QDragEnterEvent, QDropEvent, QDrag
 import configparser
 import argparse
-import os
 import logging
 
+import perf
+from sig_cache import MappingCache, DEFAULT_CACHE_DIR
+from sig_mapper import SignalMapper, load_mapping, read_rules, tcl_files, translate_file
+
 # 初始化日志
 logging.basicConfig(
     filename='app.log',
@@ -19,350 +15,93 @@ logging.basicConfig(
     level=logging.INFO
 )
 
-original_prefix_entry_default = "harness.U_DUT.XXX.SUB"
-target_prefix_entry_default = "harness.U_DUT.HARDENED_TOP.XXX.SUB"
-
-# 添加在类顶部
-SIGNAL_DRAG_MODE = '信号拖拽模式'
-WAVEFORM_MODE = '波形模式'
-
-class SignalDragLabel(QLabel):
-    def __init__(self, title, parent=None, is_drag_out=False):
-        super().__init__(title, parent)
-        self.setAlignment(Qt.AlignCenter)
-        self.setStyleSheet("""
-            QLabel {
-                background-color: lightgray; 
-                border: 2px dashed black;
-                font-size: 14px;
-                padding: 10px;
-                width: 200px;
-            }
-            QLabel:hover {
-                background-color: #d3d3d3;
-            }
-        """)
-        self.setAcceptDrops(True)
-        self.setSizePolicy(QSizePolicy.Expanding, QSizePolicy.Expanding)
-        self.is_drag_out = is_drag_out
-        self.drag_text = ""  # 初始化拖动文本
-
-    def dragEnterEvent(self, event: QDragEnterEvent):
-        if self.is_drag_out:
-            # 拒绝拖入操作，并显示禁止光标
-            event.ignore()
-        elif event.mimeData().hasText():
-            event.acceptProposedAction()
-
-    def dropEvent(self, event: QDropEvent):
-        if not self.is_drag_out:
-            text = event.mimeData().text()
-            self.parent().handle_drop(text, self)
-            event.acceptProposedAction()
+def read_settings(config_file='config.ini'):
+    # 与图形界面共用的配置文件
+    config = configparser.ConfigParser()
+    config.read(config_file)
+    if 'Settings' not in config:
+        return dict()
+    return dict(config['Settings'])
+
+def create_mapper(tcl_path='', original_prefix=None, target_prefix=None, workers=None, cache=None, rules=None):
+    # 加载映射文件并创建信号转换器，original_prefix为空时不做hdl_path前缀替换
+    index = load_mapping(tcl_files(tcl_path), workers, cache)
+    if original_prefix:
+        return SignalMapper(index, original_prefix, target_prefix or '', rules)
+    return SignalMapper(index, rules=rules)
+
+def translate(args):
+    # 批处理模式：不导入Qt，逐行转换.rc文件或标准输入中的信号列表
+    settings = read_settings(args.config)
+    tcl_path = args.tcl if args.tcl is not None else settings.get('tcl_path', '')
+    original_prefix = args.original_prefix
+    target_prefix = args.target_prefix
+    if original_prefix is None and settings.get('enable_hdl_path_prefix', 'False') == 'True':
+        original_prefix = settings.get('original_prefix')
+        target_prefix = settings.get('target_prefix')
+    waveforms = (settings.get('pre_waveform'), args.post_waveform or settings.get('post_waveform'))
+
+    rules = read_rules(args.rules or args.config)
+
+    cache = None if args.no_cache else MappingCache(args.cache)
+    mapper = create_mapper(tcl_path, original_prefix, target_prefix, args.workers, cache, rules)
+
+    inputs = args.inputs or ['-']
+    if len(inputs) > 1 and args.output:
+        raise Exception('-o only works with a single input')
+    n_unmatched = 0
+    for src in inputs:
+        if args.output:
+            dst = sys.stdout if args.output == '-' else args.output
+        elif src == '-':
+            dst = sys.stdout
         else:
-            # 拒绝拖入操作
-            event.ignore()
-
-    def mousePressEvent(self, event):
-        if self.is_drag_out and self.drag_text:
-            drag = QDrag(self)
-            mime_data = QMimeData()
-            mime_data.setText(self.drag_text)
-            drag.setMimeData(mime_data)
-
-            # 开始拖动操作
-            drop_action = drag.exec_(Qt.CopyAction | Qt.MoveAction)
-
-    def set_drag_text(self, text):
-        if self.is_drag_out:
-            self.drag_text = text
-        # self.setText(text)
-
-class SignalDragMode(QWidget):
-    def __init__(self, parent=None):
-        super().__init__(parent)
-        self.parent = parent
-        self.processed_result = ""  # 初始化处理结果
-        self.create_widgets()
-
-    def create_widgets(self):
-        layout = QVBoxLayout(self)
-
-        instruction_label = QLabel(f"{SIGNAL_DRAG_MODE}：如果前后仿波形已经打开，将前仿信号拖入，经转换后再拖入后仿波形")
-        instruction_label.setWordWrap(True)
-        # 统一样式并增加 padding
-        instruction_label.setStyleSheet("""
-            QLabel {
-                font-weight: bold;
-                padding: 10px;
-            }
-        """)
-        layout.addWidget(instruction_label)
-
-        drag_layout = QHBoxLayout()
-
-        # 拖入区域
-        self.drag_in_label = SignalDragLabel("将前仿verdi中的信号拖入这里", self, is_drag_out=False)
-        self.drag_in_label.setToolTip("将前仿verdi中的信号拖入这里")
-        drag_layout.addWidget(self.drag_in_label)
-
-        # 拖出区域
-        self.drag_out_label = SignalDragLabel("将此处信号拖出到后仿verdi中", self, is_drag_out=True)
-        self.drag_out_label.setToolTip("将此处信号拖出到后仿verdi中")
-        drag_layout.addWidget(self.drag_out_label)
-
-        layout.addLayout(drag_layout)
-
-    def handle_drop(self, text, label):
-        if label == self.drag_in_label:
-            pre_signal = text
-            pre_tail = ""
-            if len(pre_signal) > 300:  # 如果输入信号超过300字符，则截断并添加省略号
-                pre_tail = " ..."
-            self.drag_in_label.setText(f"输入：\n{pre_signal[:300]}{pre_tail}")
-
-            post_signal = self.process_signal(text)
-            post_head = ""
-            post_tail = ""
-            if len(post_signal) > 300:  # 如果输出信号超过300字符，则截断并添加省略号
-                post_tail = " ..."
-            self.drag_out_label.setText(f"输出：\n{post_signal[:300]}{post_tail}")
-        elif label == self.drag_out_label:
-            # 这里可以添加拖出信号的处理逻辑
-            pass
-
-    def process_signal(self, signal):
-        # 添加实际的信号处理逻辑
-        # 这里只是简单地返回原始信号，可以根据需求进行修改
-        post_signal = 'post ===> ' + signal
-        self.drag_out_label.set_drag_text(post_signal)
-        return post_signal
-
-class WaveformMode(QWidget):
-    def __init__(self, parent=None):
-        super().__init__(parent)
-        self.parent = parent
-        self.create_widgets()
-
-    def create_widgets(self):
-        layout = QVBoxLayout(self)
-        instruction_label = QLabel(f"{WAVEFORM_MODE}: 配置参数并打开波形")
-        instruction_label.setWordWrap(True)
-        # 统一样式并增加 padding
-        instruction_label.setStyleSheet("""
-            QLabel {
-                font-weight: bold;
-                padding: 10px;
-            }
-        """)
-        layout.addWidget(instruction_label)
- 
-        config_frame = QGroupBox("参数配置")
-        config_layout = QGridLayout(config_frame)
-        layout.addWidget(config_frame)
-
-        config_layout.addWidget(QLabel("前仿波形（.fsdb）文件路径:"), 0, 0)
-        self.pre_waveform_entry = QLineEdit(self)
-        self.pre_waveform_entry.setPlaceholderText("请输入前仿波形文件路径")
-        config_layout.addWidget(self.pre_waveform_entry, 0, 1)
-        browse_pre_waveform_button = QPushButton("浏览")
-        browse_pre_waveform_button.clicked.connect(self.browse_pre_waveform)
-        config_layout.addWidget(browse_pre_waveform_button, 0, 2)
-
-        config_layout.addWidget(QLabel("前仿信号（.rc）文件路径:"), 1, 0)
-        self.pre_signal_entry = QLineEdit(self)
-        self.pre_signal_entry.setPlaceholderText("请输入前仿信号文件路径")
-        config_layout.addWidget(self.pre_signal_entry, 1, 1)
-        browse_pre_signal_button = QPushButton("浏览")
-        browse_pre_signal_button.clicked.connect(self.browse_pre_signal)
-        config_layout.addWidget(browse_pre_signal_button, 1, 2)
-
-        config_layout.addWidget(QLabel("后仿波形（.fsdb）文件路径:"), 2, 0)
-        self.post_waveform_entry = QLineEdit(self)
-        self.post_waveform_entry.setPlaceholderText("请输入后仿波形文件路径")
-        config_layout.addWidget(self.post_waveform_entry, 2, 1)
-        browse_post_waveform_button = QPushButton("浏览")
-        browse_post_waveform_button.clicked.connect(self.browse_post_waveform)
-        config_layout.addWidget(browse_post_waveform_button, 2, 2)
-
-        open_waveform_button = QPushButton("打开波形")
-        open_waveform_button.clicked.connect(self.open_waveform)
-        open_waveform_button.setStyleSheet("""
-            QPushButton {
-                background-color: #4CAF50;
-                color: white;
-                padding: 10px;
-                font-size: 16px;
-                border: none;
-                border-radius: 5px;
-            }
-            QPushButton:hover {
-                background-color: #45a049;
-            }
-        """)
-        layout.addWidget(open_waveform_button)
-
-    def browse_pre_waveform(self):
-        file_path, _ = QFileDialog.getOpenFileName(self, "选择前仿波形文件")
-        if file_path:
-            self.pre_waveform_entry.setText(file_path)
-
-    def browse_pre_signal(self):
-        file_path, _ = QFileDialog.getOpenFileName(self, "选择前仿信号文件")
-        if file_path:
-            self.pre_signal_entry.setText(file_path)
-
-    def browse_post_waveform(self):
-        file_path, _ = QFileDialog.getOpenFileName(self, "选择后仿波形文件")
-        if file_path:
-            self.post_waveform_entry.setText(file_path)
-
-    def open_waveform(self):
-        logging.info("尝试打开波形")
-        pre_waveform = self.pre_waveform_entry.text()
-        pre_signal = self.pre_signal_entry.text()
-        post_waveform = self.post_waveform_entry.text()
-
-        if not pre_waveform or not pre_signal or not post_waveform:
-            QMessageBox.warning(self, "输入错误", "请确保所有文件路径已填写。")
-            return
-
-        # 验证文件扩展名
-        if not pre_waveform.endswith('.fsdb') or not post_waveform.endswith('.fsdb') or not pre_signal.endswith('.rc'):
-            QMessageBox.warning(self, "格式错误", "文件格式不正确。请检查文件扩展名。")
-            return
-
-        # 验证文件是否可访问
-        for file_path in [pre_waveform, pre_signal, post_waveform]:
-            if not os.path.exists(file_path):
-                QMessageBox.warning(self, "文件不存在", f"文件不存在或无法访问: {file_path}")
-                return
-
-        self.parent.save_config()
-        QMessageBox.information(self, "成功", "波形已成功打开。")
-        logging.info("波形成功打开")
-        # 添加打开波形的逻辑
-
-class MultiModeReceiver(QMainWindow):
-    def __init__(self, config_file='config.ini'):
-        super().__init__()
-        self.setWindowTitle("多功能接收窗口")
-        self.setGeometry(100, 100, 800, 390)
-        self.config_file = config_file
-        self.create_widgets()
-        self.load_config()
-        # 连接选项卡变化信号
-        self.notebook.currentChanged.connect(self.on_tab_changed)
-    
-    def create_widgets(self):
-        central_widget = QWidget(self)
-        self.setCentralWidget(central_widget)
-        layout = QVBoxLayout(central_widget)
-
-        self.create_mapping_frame(layout)
-        self.create_notebook(layout)
-
-    def create_mapping_frame(self, layout):
-        mapping_frame = QGroupBox("映射关系配置")
-        mapping_layout = QGridLayout(mapping_frame)
-        layout.addWidget(mapping_frame)
-
-        mapping_layout.addWidget(QLabel("映射文件（.tcl）路径:"), 0, 0)
-        self.path_entry = QLineEdit(self)
-        self.path_entry.setPlaceholderText("请输入tcl文件夹或文件路径，多个文件用;隔开")
-        mapping_layout.addWidget(self.path_entry, 0, 1, 1, 3)
-        browse_path_button = QPushButton("浏览文件夹")
-        browse_path_button.clicked.connect(self.browse_path)
-        mapping_layout.addWidget(browse_path_button, 0, 4)
-        browse_files_button = QPushButton("浏览文件")
-        browse_files_button.clicked.connect(self.browse_files)
-        mapping_layout.addWidget(browse_files_button, 0, 5)
-
-        self.prefix_var = QCheckBox("启用 hdl_path 前缀替换")
-        self.prefix_var.stateChanged.connect(self.toggle_prefix_entries)
-        mapping_layout.addWidget(self.prefix_var, 1, 0, 1, 6)
-
-        mapping_layout.addWidget(QLabel("原始（前仿）前缀:"), 2, 0)
-        self.original_prefix_entry = QLineEdit(self)
-        self.original_prefix_entry.setPlaceholderText(original_prefix_entry_default)
-        self.original_prefix_entry.setDisabled(True)
-        mapping_layout.addWidget(self.original_prefix_entry, 2, 1, 1, 5)
-
-        mapping_layout.addWidget(QLabel("目标（后仿）前缀:"), 3, 0)
-        self.target_prefix_entry = QLineEdit(self)
-        self.target_prefix_entry.setPlaceholderText(target_prefix_entry_default)
-        self.target_prefix_entry.setDisabled(True)
-        mapping_layout.addWidget(self.target_prefix_entry, 3, 1, 1, 5)
-
-    def toggle_prefix_entries(self):
-        state = not self.original_prefix_entry.isEnabled()
-        self.original_prefix_entry.setEnabled(state)
-        self.target_prefix_entry.setEnabled(state)
-
-    def create_notebook(self, layout):
-        self.notebook = QTabWidget(self)
-        layout.addWidget(self.notebook)
-
-        self.signal_drag_mode = SignalDragMode(self)
-        self.waveform_mode = WaveformMode(self)
-
-        self.notebook.addTab(self.waveform_mode, WAVEFORM_MODE)
-        self.notebook.addTab(self.signal_drag_mode, SIGNAL_DRAG_MODE)
-
-    def browse_path(self):
-        path = QFileDialog.getExistingDirectory(self, "选择文件夹")
-        if path:
-            self.path_entry.setText(path)
-
-    def browse_files(self):
-        files, _ = QFileDialog.getOpenFileNames(self, "选择文件")
-        if files:
-            self.path_entry.setText(';'.join(files))
-
-    def load_config(self):
-        config = configparser.ConfigParser()
-        config.read(self.config_file)
-        if 'Settings' in config:
-            self.path_entry.setText(config.get('Settings', 'tcl_path', fallback=''))
-            self.waveform_mode.pre_waveform_entry.setText(config.get('Settings', 'pre_waveform', fallback=''))
-            self.waveform_mode.pre_signal_entry.setText(config.get('Settings', 'pre_signal', fallback=''))
-            self.waveform_mode.post_waveform_entry.setText(config.get('Settings', 'post_waveform', fallback=''))
-            self.prefix_var.setChecked(config.getboolean('Settings', 'enable_hdl_path_prefix', fallback=False))
-            self.original_prefix_entry.setText(config.get('Settings', 'original_prefix', fallback=original_prefix_entry_default))
-            self.target_prefix_entry.setText(config.get('Settings', 'target_prefix', fallback=target_prefix_entry_default))
-        # self.toggle_prefix_entries()
-    
-    def save_config(self):
-        config = configparser.ConfigParser()
-        config['Settings'] = {
-            'tcl_path': self.path_entry.text(),
-            'pre_waveform': self.waveform_mode.pre_waveform_entry.text(),
-            'pre_signal': self.waveform_mode.pre_signal_entry.text(),
-            'post_waveform': self.waveform_mode.post_waveform_entry.text(),
-            'enable_hdl_path_prefix': self.prefix_var.isChecked(),
-            'original_prefix': self.original_prefix_entry.text(),
-            'target_prefix': self.target_prefix_entry.text(),
-        }
-        with open(self.config_file, 'w') as configfile:
-            config.write(configfile)
-    
-    def on_tab_changed(self, index):
-        current_tab = self.notebook.tabText(index)
-        if current_tab == SIGNAL_DRAG_MODE:
-            self.setWindowFlags(self.windowFlags() | Qt.WindowStaysOnTopHint)
-        else:
-            self.setWindowFlags(self.windowFlags() & ~Qt.WindowStaysOnTopHint)
-        self.show()
+            # 默认输出到同目录下的 *_post.rc
+            dst = src[:-len('.rc')] + '_post.rc' if src.endswith('.rc') else src + '.post'
+        with perf.phase('sig_mapping.translate_file', file=src) as p:
+            if src == '-':
+                unmatched = translate_file(sys.stdin, dst, mapper, args.format or 'list', waveforms)
+            else:
+                unmatched = translate_file(src, dst, mapper, args.format, waveforms)
+            p.count('unmatched', len(unmatched))
+        n_unmatched += len(unmatched)
+        if args.show_unmatched:
+            for signal in unmatched:
+                print(f"unmatched:{signal}", file=sys.stderr)
+    logging.info(f"批量转换 {len(inputs)} 个文件，{n_unmatched} 个信号没有匹配的映射")
+    return 1 if n_unmatched and args.strict else 0
 
 def main():
     parser = argparse.ArgumentParser(description="多功能接收窗口")
     parser.add_argument('--config', type=str, default='config.ini', help='配置文件路径')
+    parser.add_argument('-j', '--workers', type=int, default=None, help='解析映射文件的并行进程数，默认为CPU核数')
+    parser.add_argument('--cache', type=str, default=DEFAULT_CACHE_DIR, help='映射索引缓存目录')
+    parser.add_argument('--no-cache', action='store_true', help='不使用映射索引缓存')
+    perf.add_arguments(parser)
+    subparsers = parser.add_subparsers(dest='command')
+
+    # 不带子命令时打开图形界面
+    batch = subparsers.add_parser('translate', help='批处理模式：把前仿信号文件转换为后仿信号文件，不启动图形界面')
+    batch.add_argument('inputs', nargs='*', help='前仿.rc文件或信号列表文件，-或不指定时从标准输入读取信号列表')
+    batch.add_argument('-o', '--output', default=None, help='输出文件，-为标准输出；默认为同目录下的*_post.rc')
+    batch.add_argument('--format', choices=('rc', 'list'), default=None, help='输入格式，默认按扩展名判断')
+    batch.add_argument('--tcl', default=None, help='映射文件路径，默认使用配置文件中的tcl_path')
+    batch.add_argument('--original-prefix', default=None, help='原始（前仿）前缀，默认使用配置文件中的设置')
+    batch.add_argument('--target-prefix', default=None, help='目标（后仿）前缀')
+    batch.add_argument('--rules', default=None, help='包含[Rules]段的改名规则文件，默认使用配置文件中的规则')
+    batch.add_argument('--post-waveform', default=None, help='替换.rc中前仿波形路径的后仿波形路径')
+    batch.add_argument('--show-unmatched', action='store_true', help='在标准错误输出没有匹配的信号')
+    batch.add_argument('--strict', action='store_true', help='有没有匹配的信号时返回非0')
     args = parser.parse_args()
+    perf.enable_from_args(args)
+
+    if args.command == 'translate':
+        sys.exit(translate(args))
 
-    app = QApplication(sys.argv)
-    main_window = MultiModeReceiver(config_file=args.config)
-    main_window.show()
-    sys.exit(app.exec_())
+    # 只有图形界面模式才导入Qt
+    from sig_mapping_gui import run_gui
+    cache = None if args.no_cache else MappingCache(args.cache)
+    sys.exit(run_gui(config_file=args.config, workers=args.workers, cache=cache))
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,573 @@
+import sys
+from PyQt5.QtWidgets import (
+    QApplication, QMainWindow, QLabel, QVBoxLayout, QHBoxLayout,
+    QFrame, QPushButton, QTextEdit, QCheckBox, QLineEdit, QFileDialog,
+    QTabWidget, QWidget, QGroupBox, QGridLayout, QSizePolicy, QScrollArea, QMessageBox, QProgressBar
+)
+from PyQt5.QtCore import Qt, QMimeData, QObject, QRunnable, QThreadPool, pyqtSignal
+from PyQt5.QtGui import QDragEnterEvent, QDropEvent, QDrag
+import configparser
+import os
+import logging
+
+import perf
+from sig_mapper import SignalMapper, load_mapping, read_rules, tcl_files, translate_file
+
+# 图形界面，由 sig_mapping.py 在非批处理模式下导入
+
+original_prefix_entry_default = "harness.U_DUT.XXX.SUB"
+target_prefix_entry_default = "harness.U_DUT.HARDENED_TOP.XXX.SUB"
+
+# 添加在类顶部
+SIGNAL_DRAG_MODE = '信号拖拽模式'
+WAVEFORM_MODE = '波形模式'
+
+class WorkerSignals(QObject):
+    # QRunnable 不是 QObject，信号放在单独的对象上；在工作线程中发射时自动排队到界面线程
+    progress = pyqtSignal(int, int)
+    finished = pyqtSignal(object)
+    error = pyqtSignal(str)
+
+class Worker(QRunnable):
+    # 在 QThreadPool 中执行耗时的函数，避免阻塞界面
+    # with_progress 为 True 时给函数传入 progress(已完成, 总数) 和 cancelled() 两个参数
+    def __init__(self, fn, *args, with_progress=False):
+        super().__init__()
+        self.fn = fn
+        self.args = args
+        self.with_progress = with_progress
+        self.signals = WorkerSignals()
+        self.is_cancelled = False
+
+    def cancel(self):
+        self.is_cancelled = True
+
+    def run(self):
+        try:
+            if self.with_progress:
+                result = self.fn(*self.args, progress=self.signals.progress.emit, cancelled=lambda: self.is_cancelled)
+            else:
+                result = self.fn(*self.args)
+        except Exception as e:
+            logging.exception("后台任务失败")
+            self.signals.error.emit(str(e))
+            return
+        if not self.is_cancelled:
+            self.signals.finished.emit(result)
+
+def load_tcl_mapping(tcl_path, workers=None, cache=None, progress=None, cancelled=None):
+    # 查找 tcl 文件也可能很慢（网络盘上的大目录），一起放到后台
+    return load_mapping(tcl_files(tcl_path), workers, cache, progress, cancelled)
+
+def missing_file(paths):
+    # 返回第一个不存在的文件，都存在时返回 None
+    for path in paths:
+        if not os.path.exists(path):
+            return path
+    return None
+
+def post_rc_path(pre_signal):
+    # 后仿信号文件与前仿信号文件放在同一目录
+    return os.path.splitext(pre_signal)[0] + '_post.rc'
+
+def convert_waveform_files(paths, mapper):
+    # 检查文件后把前仿信号文件转换为后仿信号文件，返回(不存在的文件, 后仿信号文件, 没有匹配的信号)
+    pre_waveform, pre_signal, post_waveform = paths
+    missing = missing_file(paths)
+    if missing:
+        return missing, None, None
+    post_signal = post_rc_path(pre_signal)
+    with perf.phase('sig_mapping.translate_file', file=pre_signal) as p:
+        unmatched = translate_file(pre_signal, post_signal, mapper, 'rc', (pre_waveform, post_waveform))
+        p.count('unmatched', len(unmatched))
+    return None, post_signal, unmatched
+
+def translate_drop(mapper, text):
+    # 转换一次拖入的信号，统计每次拖入转换的信号数和耗时
+    with perf.phase('sig_mapping.drop') as p:
+        post_signal, unmatched = mapper.translate_text(text)
+        p.count('signals', len(text.split()))
+        p.count('unmatched', len(unmatched))
+    return post_signal, unmatched
+
+def truncate(text, limit=300):
+    # 超过 limit 个字符时截断并添加省略号
+    return text[:limit] + (" ..." if len(text) > limit else "")
+
+class SignalDragLabel(QLabel):
+    def __init__(self, title, parent=None, is_drag_out=False):
+        super().__init__(title, parent)
+        self.setAlignment(Qt.AlignCenter)
+        self.setStyleSheet("""
+            QLabel {
+                background-color: lightgray; 
+                border: 2px dashed black;
+                font-size: 14px;
+                padding: 10px;
+                width: 200px;
+            }
+            QLabel:hover {
+                background-color: #d3d3d3;
+            }
+        """)
+        self.setAcceptDrops(True)
+        self.setSizePolicy(QSizePolicy.Expanding, QSizePolicy.Expanding)
+        self.is_drag_out = is_drag_out
+        self.drag_text = ""  # 初始化拖动文本
+
+    def dragEnterEvent(self, event: QDragEnterEvent):
+        if self.is_drag_out:
+            # 拒绝拖入操作，并显示禁止光标
+            event.ignore()
+        elif event.mimeData().hasText():
+            event.acceptProposedAction()
+
+    def dropEvent(self, event: QDropEvent):
+        if not self.is_drag_out:
+            text = event.mimeData().text()
+            self.parent().handle_drop(text, self)
+            event.acceptProposedAction()
+        else:
+            # 拒绝拖入操作
+            event.ignore()
+
+    def mousePressEvent(self, event):
+        if self.is_drag_out and self.drag_text:
+            drag = QDrag(self)
+            mime_data = QMimeData()
+            mime_data.setText(self.drag_text)
+            drag.setMimeData(mime_data)
+
+            # 开始拖动操作
+            drop_action = drag.exec_(Qt.CopyAction | Qt.MoveAction)
+
+    def set_drag_text(self, text):
+        if self.is_drag_out:
+            self.drag_text = text
+        # self.setText(text)
+
+class SignalDragMode(QWidget):
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.parent = parent
+        self.processed_result = ""  # 初始化处理结果
+        self.pending_signal = None   # 映射索引建立期间拖入的信号，就绪后再转换
+        self.translate_worker = None
+        self.create_widgets()
+
+    def create_widgets(self):
+        layout = QVBoxLayout(self)
+
+        instruction_label = QLabel(f"{SIGNAL_DRAG_MODE}：如果前后仿波形已经打开，将前仿信号拖入，经转换后再拖入后仿波形")
+        instruction_label.setWordWrap(True)
+        # 统一样式并增加 padding
+        instruction_label.setStyleSheet("""
+            QLabel {
+                font-weight: bold;
+                padding: 10px;
+            }
+        """)
+        layout.addWidget(instruction_label)
+
+        drag_layout = QHBoxLayout()
+
+        # 拖入区域
+        self.drag_in_label = SignalDragLabel("将前仿verdi中的信号拖入这里", self, is_drag_out=False)
+        self.drag_in_label.setToolTip("将前仿verdi中的信号拖入这里")
+        drag_layout.addWidget(self.drag_in_label)
+
+        # 拖出区域
+        self.drag_out_label = SignalDragLabel("将此处信号拖出到后仿verdi中", self, is_drag_out=True)
+        self.drag_out_label.setToolTip("将此处信号拖出到后仿verdi中")
+        drag_layout.addWidget(self.drag_out_label)
+
+        layout.addLayout(drag_layout)
+
+    def handle_drop(self, text, label):
+        if label == self.drag_in_label:
+            self.drag_in_label.setText(f"输入：\n{truncate(text)}")
+            self.process_signal(text)
+        elif label == self.drag_out_label:
+            # 这里可以添加拖出信号的处理逻辑
+            pass
+
+    def process_signal(self, signal):
+        # 按映射文件和 hdl_path 前缀替换把拖入的前仿信号（可以有多个）转换为后仿信号
+        # 转换在后台线程中进行，完成后更新拖出区域；映射索引还没建立好时先记下，就绪后再转换
+        mapper = self.parent.get_mapper()
+        if mapper is None:
+            self.pending_signal = signal
+            self.drag_out_label.setText("输出：\n映射索引建立中，完成后自动转换 ...")
+            return
+
+        worker = Worker(translate_drop, mapper, signal)
+        worker.signals.finished.connect(lambda result, worker=worker: self.on_translated(worker, result))
+        worker.signals.error.connect(lambda message: self.drag_out_label.setText(f"输出：\n转换失败：{message}"))
+        # 新的拖入会替换还没完成的转换
+        self.translate_worker = worker
+        self.drag_out_label.setText("输出：\n转换中 ...")
+        self.parent.pool.start(worker)
+
+    def on_translated(self, worker, result):
+        if worker is not self.translate_worker:
+            return
+        self.translate_worker = None
+        post_signal, unmatched = result
+        self.processed_result = post_signal
+        self.drag_out_label.set_drag_text(post_signal)
+        text = f"输出：\n{truncate(post_signal)}"
+        if unmatched:
+            logging.info(f"{len(unmatched)} 个信号没有匹配的映射: {' '.join(unmatched[:20])}")
+            text += f"\n{len(unmatched)} 个信号没有匹配的映射：{truncate(' '.join(unmatched), 100)}"
+        self.drag_out_label.setText(text)
+
+    def on_mapping_ready(self):
+        if self.pending_signal is not None:
+            signal = self.pending_signal
+            self.pending_signal = None
+            self.process_signal(signal)
+
+class WaveformMode(QWidget):
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.parent = parent
+        self.create_widgets()
+
+    def create_widgets(self):
+        layout = QVBoxLayout(self)
+        instruction_label = QLabel(f"{WAVEFORM_MODE}: 配置参数并打开波形")
+        instruction_label.setWordWrap(True)
+        # 统一样式并增加 padding
+        instruction_label.setStyleSheet("""
+            QLabel {
+                font-weight: bold;
+                padding: 10px;
+            }
+        """)
+        layout.addWidget(instruction_label)
+ 
+        config_frame = QGroupBox("参数配置")
+        config_layout = QGridLayout(config_frame)
+        layout.addWidget(config_frame)
+
+        config_layout.addWidget(QLabel("前仿波形（.fsdb）文件路径:"), 0, 0)
+        self.pre_waveform_entry = QLineEdit(self)
+        self.pre_waveform_entry.setPlaceholderText("请输入前仿波形文件路径")
+        config_layout.addWidget(self.pre_waveform_entry, 0, 1)
+        browse_pre_waveform_button = QPushButton("浏览")
+        browse_pre_waveform_button.clicked.connect(self.browse_pre_waveform)
+        config_layout.addWidget(browse_pre_waveform_button, 0, 2)
+
+        config_layout.addWidget(QLabel("前仿信号（.rc）文件路径:"), 1, 0)
+        self.pre_signal_entry = QLineEdit(self)
+        self.pre_signal_entry.setPlaceholderText("请输入前仿信号文件路径")
+        config_layout.addWidget(self.pre_signal_entry, 1, 1)
+        browse_pre_signal_button = QPushButton("浏览")
+        browse_pre_signal_button.clicked.connect(self.browse_pre_signal)
+        config_layout.addWidget(browse_pre_signal_button, 1, 2)
+
+        config_layout.addWidget(QLabel("后仿波形（.fsdb）文件路径:"), 2, 0)
+        self.post_waveform_entry = QLineEdit(self)
+        self.post_waveform_entry.setPlaceholderText("请输入后仿波形文件路径")
+        config_layout.addWidget(self.post_waveform_entry, 2, 1)
+        browse_post_waveform_button = QPushButton("浏览")
+        browse_post_waveform_button.clicked.connect(self.browse_post_waveform)
+        config_layout.addWidget(browse_post_waveform_button, 2, 2)
+
+        self.open_waveform_button = open_waveform_button = QPushButton("打开波形")
+        open_waveform_button.clicked.connect(self.open_waveform)
+        open_waveform_button.setStyleSheet("""
+            QPushButton {
+                background-color: #4CAF50;
+                color: white;
+                padding: 10px;
+                font-size: 16px;
+                border: none;
+                border-radius: 5px;
+            }
+            QPushButton:hover {
+                background-color: #45a049;
+            }
+        """)
+        layout.addWidget(open_waveform_button)
+
+    def browse_pre_waveform(self):
+        file_path, _ = QFileDialog.getOpenFileName(self, "选择前仿波形文件")
+        if file_path:
+            self.pre_waveform_entry.setText(file_path)
+
+    def browse_pre_signal(self):
+        file_path, _ = QFileDialog.getOpenFileName(self, "选择前仿信号文件")
+        if file_path:
+            self.pre_signal_entry.setText(file_path)
+
+    def browse_post_waveform(self):
+        file_path, _ = QFileDialog.getOpenFileName(self, "选择后仿波形文件")
+        if file_path:
+            self.post_waveform_entry.setText(file_path)
+
+    def open_waveform(self):
+        logging.info("尝试打开波形")
+        pre_waveform = self.pre_waveform_entry.text()
+        pre_signal = self.pre_signal_entry.text()
+        post_waveform = self.post_waveform_entry.text()
+
+        if not pre_waveform or not pre_signal or not post_waveform:
+            QMessageBox.warning(self, "输入错误", "请确保所有文件路径已填写。")
+            return
+
+        # 验证文件扩展名
+        if not pre_waveform.endswith('.fsdb') or not post_waveform.endswith('.fsdb') or not pre_signal.endswith('.rc'):
+            QMessageBox.warning(self, "格式错误", "文件格式不正确。请检查文件扩展名。")
+            return
+
+        mapper = self.parent.get_mapper()
+        if mapper is None:
+            QMessageBox.warning(self, "映射未就绪", "映射索引建立中，请稍后再试。")
+            return
+
+        # 验证文件是否可访问并转换信号文件，文件可能在网络盘上，放到后台进行
+        worker = Worker(convert_waveform_files, [pre_waveform, pre_signal, post_waveform], mapper)
+        worker.signals.finished.connect(self.on_files_checked)
+        worker.signals.error.connect(self.on_files_check_failed)
+        self.check_worker = worker
+        self.open_waveform_button.setEnabled(False)
+        self.parent.pool.start(worker)
+
+    def on_files_check_failed(self, message):
+        self.open_waveform_button.setEnabled(True)
+        QMessageBox.warning(self, "文件检查失败", message)
+
+    def on_files_checked(self, result):
+        self.open_waveform_button.setEnabled(True)
+        file_path, post_signal, unmatched = result
+        if file_path:
+            QMessageBox.warning(self, "文件不存在", f"文件不存在或无法访问: {file_path}")
+            return
+
+        self.parent.save_config()
+        message = f"波形已成功打开。后仿信号文件：{post_signal}"
+        if unmatched:
+            message += f"\n{len(unmatched)} 个信号没有匹配的映射。"
+        QMessageBox.information(self, "成功", message)
+        logging.info("波形成功打开")
+        # 添加打开波形的逻辑
+
+class MultiModeReceiver(QMainWindow):
+    def __init__(self, config_file='config.ini', workers=None, cache=None):
+        super().__init__()
+        self.setWindowTitle("多功能接收窗口")
+        self.setGeometry(100, 100, 800, 390)
+        self.config_file = config_file
+        self.workers = workers    # 解析 tcl 的进程数
+        self.cache = cache        # 编译后映射索引的缓存
+        self.mapping = None       # 已加载的映射索引
+        self.mapping_path = None  # 映射索引对应的 tcl 路径
+        self.load_worker = None   # 正在加载映射的后台任务
+        self.rules = read_rules(config_file)  # 网表改名规则
+        self.mapper = None        # 复用的信号转换器，保留其中的转换缓存
+        self.mapper_key = None
+        self.pool = QThreadPool.globalInstance()
+        self.create_widgets()
+        self.load_config()
+        self.load_mapping_async()
+        # 连接选项卡变化信号
+        self.notebook.currentChanged.connect(self.on_tab_changed)
+    
+    def create_widgets(self):
+        central_widget = QWidget(self)
+        self.setCentralWidget(central_widget)
+        layout = QVBoxLayout(central_widget)
+
+        self.create_mapping_frame(layout)
+        self.create_notebook(layout)
+
+    def create_mapping_frame(self, layout):
+        mapping_frame = QGroupBox("映射关系配置")
+        mapping_layout = QGridLayout(mapping_frame)
+        layout.addWidget(mapping_frame)
+
+        mapping_layout.addWidget(QLabel("映射文件（.tcl）路径:"), 0, 0)
+        self.path_entry = QLineEdit(self)
+        self.path_entry.setPlaceholderText("请输入tcl文件夹或文件路径，多个文件用;隔开")
+        mapping_layout.addWidget(self.path_entry, 0, 1, 1, 3)
+        browse_path_button = QPushButton("浏览文件夹")
+        browse_path_button.clicked.connect(self.browse_path)
+        mapping_layout.addWidget(browse_path_button, 0, 4)
+        browse_files_button = QPushButton("浏览文件")
+        browse_files_button.clicked.connect(self.browse_files)
+        mapping_layout.addWidget(browse_files_button, 0, 5)
+
+        self.prefix_var = QCheckBox("启用 hdl_path 前缀替换")
+        self.prefix_var.stateChanged.connect(self.toggle_prefix_entries)
+        mapping_layout.addWidget(self.prefix_var, 1, 0, 1, 6)
+
+        mapping_layout.addWidget(QLabel("原始（前仿）前缀:"), 2, 0)
+        self.original_prefix_entry = QLineEdit(self)
+        self.original_prefix_entry.setPlaceholderText(original_prefix_entry_default)
+        self.original_prefix_entry.setDisabled(True)
+        mapping_layout.addWidget(self.original_prefix_entry, 2, 1, 1, 5)
+
+        mapping_layout.addWidget(QLabel("目标（后仿）前缀:"), 3, 0)
+        self.target_prefix_entry = QLineEdit(self)
+        self.target_prefix_entry.setPlaceholderText(target_prefix_entry_default)
+        self.target_prefix_entry.setDisabled(True)
+        mapping_layout.addWidget(self.target_prefix_entry, 3, 1, 1, 5)
+
+        # 映射索引状态：未加载/索引中/就绪，加载在后台进行，可以取消
+        self.mapping_status = QLabel("映射状态：未加载")
+        mapping_layout.addWidget(self.mapping_status, 4, 0, 1, 2)
+        self.mapping_progress = QProgressBar(self)
+        self.mapping_progress.hide()
+        mapping_layout.addWidget(self.mapping_progress, 4, 2, 1, 3)
+        self.cancel_load_button = QPushButton("取消")
+        self.cancel_load_button.clicked.connect(self.cancel_load)
+        self.cancel_load_button.hide()
+        mapping_layout.addWidget(self.cancel_load_button, 4, 5)
+
+        self.path_entry.editingFinished.connect(self.load_mapping_async)
+
+    def toggle_prefix_entries(self):
+        state = not self.original_prefix_entry.isEnabled()
+        self.original_prefix_entry.setEnabled(state)
+        self.target_prefix_entry.setEnabled(state)
+
+    def create_notebook(self, layout):
+        self.notebook = QTabWidget(self)
+        layout.addWidget(self.notebook)
+
+        self.signal_drag_mode = SignalDragMode(self)
+        self.waveform_mode = WaveformMode(self)
+
+        self.notebook.addTab(self.waveform_mode, WAVEFORM_MODE)
+        self.notebook.addTab(self.signal_drag_mode, SIGNAL_DRAG_MODE)
+
+    def browse_path(self):
+        path = QFileDialog.getExistingDirectory(self, "选择文件夹")
+        if path:
+            self.path_entry.setText(path)
+            self.load_mapping_async()
+
+    def browse_files(self):
+        files, _ = QFileDialog.getOpenFileNames(self, "选择文件")
+        if files:
+            self.path_entry.setText(';'.join(files))
+            self.load_mapping_async()
+
+    def load_mapping_async(self):
+        # 在后台加载映射文件；路径没变且已加载或正在加载时不重复加载
+        tcl_path = self.path_entry.text().strip()
+        if tcl_path == self.mapping_path and (self.mapping is not None or self.load_worker is not None):
+            return
+        self.cancel_load()
+        self.mapping = None
+        self.mapping_path = tcl_path
+
+        worker = Worker(load_tcl_mapping, tcl_path, self.workers, self.cache, with_progress=True)
+        worker.signals.progress.connect(self.on_mapping_progress)
+        worker.signals.finished.connect(lambda index, worker=worker: self.on_mapping_loaded(worker, index))
+        worker.signals.error.connect(lambda message, worker=worker: self.on_mapping_error(worker, message))
+        self.load_worker = worker
+        self.mapping_status.setText("映射状态：索引中")
+        self.mapping_progress.setRange(0, 0)
+        self.mapping_progress.show()
+        self.cancel_load_button.show()
+        self.pool.start(worker)
+
+    def cancel_load(self):
+        if self.load_worker is None:
+            return
+        self.load_worker.cancel()
+        self.load_worker = None
+        self.mapping_status.setText("映射状态：已取消")
+        self.mapping_progress.hide()
+        self.cancel_load_button.hide()
+
+    def on_mapping_progress(self, done, total):
+        self.mapping_progress.setRange(0, total)
+        self.mapping_progress.setValue(done)
+        self.mapping_status.setText(f"映射状态：索引中 {done}/{total}")
+
+    def on_mapping_loaded(self, worker, index):
+        if worker is not self.load_worker:
+            return
+        self.load_worker = None
+        self.mapping = index
+        self.mapping_progress.hide()
+        self.cancel_load_button.hide()
+        self.mapping_status.setText(f"映射状态：就绪，{len(index)} 条映射")
+        logging.info(f"加载映射 {len(index)} 条")
+        self.signal_drag_mode.on_mapping_ready()
+
+    def on_mapping_error(self, worker, message):
+        if worker is not self.load_worker:
+            return
+        self.load_worker = None
+        self.mapping_progress.hide()
+        self.cancel_load_button.hide()
+        self.mapping_status.setText(f"映射状态：加载失败，{message}")
+
+    def get_mapper(self):
+        # 映射还没加载好时返回 None；前缀替换按界面上的设置
+        # 映射和前缀设置都没变化时复用同一个转换器，反复拖入相同的信号直接命中转换缓存
+        self.load_mapping_async()
+        if self.mapping is None:
+            return None
+        prefixes = None
+        if self.prefix_var.isChecked():
+            prefixes = (self.original_prefix_entry.text().strip(), self.target_prefix_entry.text().strip())
+        key = (id(self.mapping), prefixes)
+        if self.mapper is None or self.mapper_key != key:
+            if prefixes:
+                self.mapper = SignalMapper(self.mapping, prefixes[0], prefixes[1], self.rules)
+            else:
+                self.mapper = SignalMapper(self.mapping, rules=self.rules)
+            self.mapper_key = key
+        return self.mapper
+
+    def load_config(self):
+        config = configparser.ConfigParser()
+        config.read(self.config_file)
+        if 'Settings' in config:
+            self.path_entry.setText(config.get('Settings', 'tcl_path', fallback=''))
+            self.waveform_mode.pre_waveform_entry.setText(config.get('Settings', 'pre_waveform', fallback=''))
+            self.waveform_mode.pre_signal_entry.setText(config.get('Settings', 'pre_signal', fallback=''))
+            self.waveform_mode.post_waveform_entry.setText(config.get('Settings', 'post_waveform', fallback=''))
+            self.prefix_var.setChecked(config.getboolean('Settings', 'enable_hdl_path_prefix', fallback=False))
+            self.original_prefix_entry.setText(config.get('Settings', 'original_prefix', fallback=original_prefix_entry_default))
+            self.target_prefix_entry.setText(config.get('Settings', 'target_prefix', fallback=target_prefix_entry_default))
+        # self.toggle_prefix_entries()
+    
+    def save_config(self):
+        # 保留配置文件中的其他段，如[Rules]
+        config = configparser.ConfigParser(interpolation=None)
+        config.read(self.config_file)
+        config['Settings'] = {
+            'tcl_path': self.path_entry.text(),
+            'pre_waveform': self.waveform_mode.pre_waveform_entry.text(),
+            'pre_signal': self.waveform_mode.pre_signal_entry.text(),
+            'post_waveform': self.waveform_mode.post_waveform_entry.text(),
+            'enable_hdl_path_prefix': self.prefix_var.isChecked(),
+            'original_prefix': self.original_prefix_entry.text(),
+            'target_prefix': self.target_prefix_entry.text(),
+        }
+        with open(self.config_file, 'w') as configfile:
+            config.write(configfile)
+    
+    def closeEvent(self, event):
+        self.cancel_load()
+        super().closeEvent(event)
+
+    def on_tab_changed(self, index):
+        current_tab = self.notebook.tabText(index)
+        if current_tab == SIGNAL_DRAG_MODE:
+            self.setWindowFlags(self.windowFlags() | Qt.WindowStaysOnTopHint)
+        else:
+            self.setWindowFlags(self.windowFlags() & ~Qt.WindowStaysOnTopHint)
+        self.show()
+
+def run_gui(config_file='config.ini', workers=None, cache=None):
+    app = QApplication(sys.argv)
+    main_window = MultiModeReceiver(config_file=config_file, workers=workers, cache=cache)
+    main_window.show()
+    return app.exec_()
@@ -1,23 +1,278 @@
 import xml.etree.ElementTree as ET
 from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+import glob
+import gzip
+import os
+import sys
+import warnings
+from array import array
+from functools import partial
+
+import perf
+from cov_cache import CoverageCache, DEFAULT_CACHE_DIR, DEFAULT_MAX_BYTES
+
+# 可选依赖：numpy用于auto_c紧凑数据的向量化解码
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# 可选的更快的gzip解压实现
+try:
+    from isal import igzip as fast_gzip
+except ImportError:
+    fast_gzip = None
+
+GZIP_MAGIC = b'\x1f\x8b'
+
+def open_xml(file):
+    # VCS生成的xml实际可能是gzip压缩的，根据文件头自动识别并边读边解压
+    with open(file, 'rb') as f:
+        magic = f.read(2)
+    if magic != GZIP_MAGIC:
+        return open(file, 'rb')
+    if fast_gzip is not None:
+        return fast_gzip.open(file, 'rb')
+    return gzip.open(file, 'rb')
+
+INT64_MIN = -(1 << 63)
+INT64_MAX = (1 << 63) - 1
+
+def _fromstring(text):
+    try:
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore', DeprecationWarning)
+            values = np.fromstring(text, dtype=np.int64, sep=' ')
+    except ValueError:
+        return None
+    # 超出int64范围的值(如宽位宽无符号的auto_c)会被截断成最大/最小值，交给逐个转换再判断
+    if len(values) and (values.max() == INT64_MAX or values.min() == INT64_MIN):
+        return None
+    return values
+
+def _int_column(text):
+    # 逐个转换为int64数组，有非整数或超出int64范围的值时返回None
+    try:
+        return array('q', map(int, text.split())) if text else array('q')
+    except (ValueError, OverflowError):
+        return None
+
+def parse_compact(vals, index):
+    # 解码auto_c的compact数据，返回(命中次数数组, 命中值数组)
+    hits = idx = None
+    if np is not None:
+        hits = _fromstring(vals)
+        idx = _fromstring(index)
+    if hits is None:
+        hits = array('q', map(int, vals.split())) if vals else array('q')
+    # 命中值不是int64范围内的整数时解析失败或数组长度对不上，按字符串保存
+    if idx is None or len(idx) != len(hits):
+        idx = _int_column(index)
+        if idx is None or len(idx) != len(hits):
+            idx = [sys.intern(v) for v in index.split(' ')] if index else []
+    return hits, idx
+
+def int_array(values):
+    # 命中次数列：有numpy时用int64数组，否则用array('q')
+    if np is not None:
+        return np.asarray(values, dtype=np.int64)
+    return array('q', values)
+
+def add_flags(mine, other, scale=1):
+    # 排除/不可达标记按标记的test个数累加，结果与合并顺序无关，扣除test时也能减回去
+    if other is None:
+        return mine
+    if mine is None:
+        return array('q', (f * scale for f in other))
+    return array('q', (a + b * scale for a, b in zip(mine, other)))
+
+def same_bins(a, b):
+    if len(a) != len(b):
+        return False
+    if np is not None and isinstance(a, np.ndarray) and isinstance(b, np.ndarray):
+        return np.array_equal(a, b)
+    return all(x == y for x, y in zip(a, b))
+
+def missed_compact(hits, bins):
+    # 返回未命中bin的命中值，numpy数组时用掩码向量化筛选
+    if np is not None and isinstance(hits, np.ndarray):
+        missed = np.flatnonzero(hits == 0)
+        if isinstance(bins, np.ndarray):
+            return bins[missed]
+        return [bins[i] for i in missed]
+    return [bins[i] for i, h in enumerate(hits) if h == 0]
+
+# bin类型
+CP_USER = 'cp.user'
+CP_AUTO_C = 'cp.auto_c'
+
+class CpHits(object):
+    # 一个cp所有bin的命中数据，按列保存：命中值、命中次数、排除/不可达标记(auto_c没有)
+    # 合并多个test后排除/不可达标记为标记了该bin的test个数，非0即为排除/不可达
+    __slots__ = ('type', 'bins', 'hits', 'excl', 'unreachable')
+
+    def __init__(self, type, bins, hits, excl=None, unreachable=None):
+        self.type = type
+        self.bins = bins
+        self.hits = hits
+        self.excl = excl
+        self.unreachable = unreachable
+
+    def __len__(self):
+        return len(self.bins)
+
+    def scaled(self, scale):
+        if scale == 1:
+            hits = self.hits
+        elif np is not None and isinstance(self.hits, np.ndarray):
+            hits = self.hits * scale
+        else:
+            hits = array('q', (h * scale for h in self.hits))
+        excl, unreachable = self.excl, self.unreachable
+        if scale != 1 and excl is not None:
+            excl = array('q', (e * scale for e in excl))
+            unreachable = array('q', (u * scale for u in unreachable))
+        return CpHits(self.type, self.bins, hits, excl, unreachable)
+
+class CcHits(object):
+    # 一个cc已覆盖组合的命中次数，key为组合按各cp bin数的混合进制编码
+    __slots__ = ('cps', 'sizes', 'hits')
+
+    def __init__(self, cps, sizes, hits):
+        self.cps = cps
+        self.sizes = sizes
+        self.hits = hits
+
+class CompactBins(object):
+    # 以紧凑数组保存一个cp的漏覆盖bin，迭代接口与[{'val':..., 'type':...}]列表一致
+    __slots__ = ('vals', 'type')
+
+    def __init__(self, vals, type):
+        self.vals = vals
+        self.type = type
+
+    def __len__(self):
+        return len(self.vals)
+
+    def __iter__(self):
+        type = self.type
+        for val in self.vals:
+            yield {'val': str(val), 'type': type}
+
+# 已覆盖组合数不超过该值时用位图保存，否则用集合
+CROSS_BITMAP_LIMIT = 1 << 26
+
+class CrossHoles(object):
+    # 一个cc的漏覆盖组合：全空间为各cp bin数之积，只保存已覆盖组合的编码，
+    # 漏洞作为补集按需枚举，不展开完整的笛卡尔积
+    __slots__ = ('labels', 'sizes', 'total', 'covered', 'n_covered', 'type')
+
+    def __init__(self, labels, covered, type='cc.auto'):
+        self.labels = labels
+        self.sizes = [len(l) for l in labels]
+        self.total = 1
+        for size in self.sizes:
+            self.total *= size
+        self.type = type
+
+        # 组合<b0, b1, ..., bn>按混合进制编码为整数
+        covered = set(covered)
+        self.n_covered = len(covered)
+        if self.total <= CROSS_BITMAP_LIMIT:
+            self.covered = bytearray((self.total + 7) >> 3)
+            for code in covered:
+                self.covered[code >> 3] |= 1 << (code & 7)
+        else:
+            self.covered = covered
+
+    def encode(self, bins):
+        code = 0
+        for size, b in zip(self.sizes, bins):
+            code = code * size + b
+        return code
+
+    def decode(self, code):
+        bins = []
+        for size in reversed(self.sizes):
+            code, b = divmod(code, size)
+            bins.append(b)
+        bins.reverse()
+        return bins
+
+    def __len__(self):
+        return self.total - self.n_covered
+
+    def __contains__(self, bins):
+        # 判断组合(bin序号元组)是否为漏洞
+        code = self.encode(bins)
+        if isinstance(self.covered, bytearray):
+            return not self.covered[code >> 3] & (1 << (code & 7))
+        return code not in self.covered
+
+    def codes(self):
+        # 按编码顺序枚举漏洞
+        covered = self.covered
+        if isinstance(covered, bytearray):
+            for i, byte in enumerate(covered):
+                if byte == 0xff:
+                    continue
+                base = i << 3
+                for bit in range(8):
+                    if not byte & (1 << bit) and base + bit < self.total:
+                        yield base + bit
+        else:
+            for code in range(self.total):
+                if code not in covered:
+                    yield code
+
+    def __iter__(self):
+        type = self.type
+        for code in self.codes():
+            bins = self.decode(code)
+            yield {'val': tuple(str(l[b]) for l, b in zip(self.labels, bins)), 'type': type}
 
 class vcs_cg(object):
-    # cp/cc定义
-    cp_define_data = defaultdict(str)
-    cc_define_data = defaultdict(str)
+    def __init__(self):
+        # cp/cc定义
+        self.cp_define_data = defaultdict(str)
+        self.cc_define_data = defaultdict(str)
+
+        # 各bin的命中次数(CpHits/CcHits)，按exprname/cc名保存，多个test可直接累加
+        self.cp_hit_data = dict()
+        self.cc_hit_data = dict()
+
+        self.missed_cg_cp = defaultdict(str)
+        self.missed_cg_cc = defaultdict(str)
+
+        # 当前解析的covergroup名
+        self.cg_name = None
 
-    missed_cg_cp = defaultdict(str)
-    missed_cg_cc = defaultdict(str)
+        self.root = None
 
-    root = None
+    def parse(self, file, stream=False):
+        with perf.phase('vcs_cg.parse', file=file, stream=stream) as p:
+            n_bins = self.n_bins() if perf.enabled else 0
+            self._parse(file, stream)
+            if perf.enabled:
+                p.count('bins', self.n_bins() - n_bins)
+
+    def n_bins(self):
+        # 已解码的cp bin数，用于统计解码速度
+        return sum(len(hits) for hits in self.cp_hit_data.values())
+
+    def _parse(self, file, stream=False):
+        if stream:
+            return self.parse_stream(file)
 
-    def parse(self, file):
         # 从文件中解析XML
-        tree = ET.parse(file)
+        with open_xml(file) as f:
+            tree = ET.parse(f)
         self.root = tree.getroot()
 
         # 查找cg_src节点
         cg_src = self.root.find('.//cg_src')
+        self.cg_name = cg_src.get('name')
 
         # 查找cg_src节点下的cp/cc
         cg_srcs_cp = cg_src.findall('./cp')
@@ -25,55 +280,199 @@ class vcs_cg(object):
 
         # 解析定义
         for cp in cg_srcs_cp:
-            id = cp.get('id')
-            self.cp_define_data[id] = {'exprname': cp.get('exprname'), 'is_real': cp.get('is_real')}
+            self._parse_define(cp)
 
         for cc in cg_srcs_cc:
-            id = cp.get('id')
-            self.cc_define_data[id] = {'name': cp.get('name')}
-
-    def get_missed_cg_cp(self):
-        # 查找cg_src节点
-        cg_src = self.root.find('.//cg_src')
+            self._parse_define(cc)
 
         # 解析覆盖结果
         cg_covdef = cg_src.find('./cg_covdef')
         for cp in cg_covdef.findall('./cp'):
-            cp_type = cp.get('type')
-            cp_id = cp.get('id')
-            exprname = self.cp_define_data[cp_id]['exprname']
-            self.missed_cg_cp[exprname] = list()
-            if cp_type == 'user':
-                for bn in cp.findall('bn'):
-                    id = bn.get('id')
-                    name = bn.get('name') # 命中值
-                    data = bn.get('data') # 命中次数
-                    excl = bn.get('excl')
-                    unreachable = bn.get('unreachable')
-
-                    if data == '0' and excl == '0':
-                        self.missed_cg_cp[exprname].append({'val':name, 'type':'cp.user'})
-            elif cp_type == 'auto_c':
-                data = cp.find('data')
-                type = data.get('type')
-                vals = data.get('vals') # 命中次数
-                index = data.get('index') # 命中值
-
-                if type == 'compact':
-                    vals_arr = vals.split(' ')
-                    index_arr = index.split(' ')
-                    for i,_ in enumerate(vals_arr):
-                        if vals_arr[i] == '0':
-                            self.missed_cg_cp[exprname].append({'val':index_arr[i], 'type':'cp.auto_c'})
+            self._parse_cp_hits(cp)
+
+        for cc in cg_covdef.findall('./cc'):
+            self._parse_cc_hits(cc)
+
+    def parse_stream(self, file):
+        # 流式解析：单遍读取cg_src下的cp/cc定义和cg_covdef下的覆盖结果，
+        # 每条记录处理完后立即从树上摘除，峰值内存与文件大小无关
+        self.root = None
+
+        with open_xml(file) as f:
+            self._parse_stream(f)
+
+    def _parse_stream(self, f):
+        stack = []
+        record_depth = None  # 当前记录(cp/cc)所在的层级
+        for event, elem in ET.iterparse(f, events=('start', 'end')):
+            if event == 'start':
+                if elem.tag == 'cg_src':
+                    self.cg_name = elem.get('name')
+                if record_depth is None and elem.tag in ('cp', 'cc') and stack \
+                        and stack[-1].tag in ('cg_src', 'cg_covdef'):
+                    record_depth = len(stack)
+                stack.append(elem)
+                continue
+
+            stack.pop()
+            if record_depth is not None and len(stack) > record_depth:
+                # 记录内部的子节点，等整条记录结束后再一起处理
+                continue
+
+            parent = stack[-1] if stack else None
+            if record_depth is not None:
+                record_depth = None
+                if parent.tag == 'cg_src':
+                    self._parse_define(elem)
+                elif elem.tag == 'cp':
+                    self._parse_cp_hits(elem)
+                else:
+                    self._parse_cc_hits(elem)
+
+            if parent is not None:
+                parent.remove(elem)
+
+            # 与DOM模式一致，只处理第一个cg_src
+            if elem.tag == 'cg_src':
+                break
+
+    def _parse_define(self, elem):
+        id = elem.get('id')
+        if elem.tag == 'cp':
+            self.cp_define_data[id] = {'exprname': sys.intern(elem.get('exprname')), 'is_real': elem.get('is_real'), 'cg': self.cg_name}
+        else:
+            # cc定义下的<cp id=.../>依次为参与交叉的cp
+            self.cc_define_data[id] = {'name': sys.intern(elem.get('name')), 'cps': [cp.get('id') for cp in elem.findall('./cp')]}
+
+    def _parse_cp_hits(self, cp):
+        cp_type = cp.get('type')
+        cp_id = cp.get('id')
+        exprname = self.cp_define_data[cp_id]['exprname']
+        if cp_type == 'user':
+            bins = list()
+            hits = array('q')
+            excl = array('b')
+            unreachable = array('b')
+            for bn in cp.findall('bn'):
+                bins.append(sys.intern(bn.get('name'))) # 命中值
+                hits.append(int(bn.get('data'))) # 命中次数
+                excl.append(bn.get('excl') != '0')
+                unreachable.append(bn.get('unreachable', '0') != '0')
+            self.cp_hit_data[exprname] = CpHits(CP_USER, bins, int_array(hits), excl, unreachable)
+        elif cp_type == 'auto_c':
+            data = cp.find('data')
+            type = data.get('type')
+            vals = data.get('vals') # 命中次数
+            index = data.get('index') # 命中值
+
+            if type == 'compact':
+                hits, bins = parse_compact(vals, index)
+                self.cp_hit_data[exprname] = CpHits(CP_AUTO_C, bins, hits)
+            else:
+                raise Exception('Unsupport tpye:' + type)
+        else:
+            raise Exception('Unsupport tpye:' + cp_type)
+
+    def _parse_cc_hits(self, cc):
+        define = self.cc_define_data[cc.get('id')]
+        cps = list()
+        for cp_id in define['cps']:
+            exprname = self.cp_define_data[cp_id]['exprname'] if cp_id in self.cp_define_data else None
+            if exprname not in self.cp_hit_data:
+                raise Exception('Unknown cp in cc ' + define['name'] + ':' + cp_id)
+            cps.append(exprname)
+        sizes = [len(self.cp_hit_data[exprname]) for exprname in cps]
+        hits = dict()
+
+        # cn_nt_s逐层嵌套对应各cp的bin序号(val)，叶子cn_t_s_d的data为命中次数
+        def walk(node, code, depth):
+            for child in node:
+                if child.tag not in ('cn_nt_s', 'cn_t_s_d'):
+                    continue
+                child_code = code * sizes[depth] + int(child.get('val'))
+                if child.tag == 'cn_t_s_d':
+                    data = int(child.get('data', '1'))
+                    if data:
+                        hits[child_code] = hits.get(child_code, 0) + data
+                else:
+                    walk(child, child_code, depth + 1)
+
+        for crosses in cc.findall('./covered_auto_crosses'):
+            walk(crosses, 0, 0)
+
+        self.cc_hit_data[define['name']] = CcHits(cps, sizes, hits)
+
+    def merge(self, other, scale=1):
+        # 将另一个test的命中次数累加到当前结果，scale=-1时从当前结果中扣除
+        self.cp_define_data.update(other.cp_define_data)
+        self.cc_define_data.update(other.cc_define_data)
 
+        for exprname, hit in other.cp_hit_data.items():
+            if exprname not in self.cp_hit_data:
+                self.cp_hit_data[exprname] = hit.scaled(scale)
+            else:
+                self._merge_cp_hits(self.cp_hit_data[exprname], hit, scale)
+
+        for name, hit in other.cc_hit_data.items():
+            if name not in self.cc_hit_data:
+                self.cc_hit_data[name] = CcHits(hit.cps, hit.sizes, {code: n * scale for code, n in hit.hits.items()})
+                continue
+            mine = self.cc_hit_data[name]
+            if mine.sizes != hit.sizes:
+                raise Exception('Mismatched cross bins:' + name)
+            hits = mine.hits
+            for code, n in hit.hits.items():
+                n = hits.get(code, 0) + n * scale
+                if n:
+                    hits[code] = n
                 else:
-                    raise Exception('Unsupport tpye:' + type)
+                    hits.pop(code, None)
+
+    def _merge_cp_hits(self, mine, hit, scale=1):
+        # 命中次数列总是生成新对象，调用方保留的旧列不受影响
+        if same_bins(mine.bins, hit.bins):
+            if np is not None and isinstance(mine.hits, np.ndarray) and isinstance(hit.hits, np.ndarray):
+                mine.hits = mine.hits + hit.hits * scale
             else:
-                raise Exception('Unsupport tpye:' + cp_type)
+                mine.hits = array('q', (a + b * scale for a, b in zip(mine.hits, hit.hits)))
+            mine.excl = add_flags(mine.excl, hit.excl, scale)
+            mine.unreachable = add_flags(mine.unreachable, hit.unreachable, scale)
+            return
 
+        # bin列表不一致时按命中值对齐
+        bins = [sys.intern(str(b)) for b in mine.bins]
+        pos = {b: i for i, b in enumerate(bins)}
+        hits = array('q', mine.hits)
+        excl = array('q', mine.excl) if mine.excl is not None else None
+        unreachable = array('q', mine.unreachable) if mine.unreachable is not None else None
+        flags = excl is not None and hit.excl is not None
+        for i, b in enumerate(hit.bins):
+            b = str(b)
+            if b in pos:
+                hits[pos[b]] += int(hit.hits[i]) * scale
+                if flags:
+                    excl[pos[b]] += hit.excl[i] * scale
+                    unreachable[pos[b]] += hit.unreachable[i] * scale
+            else:
+                pos[b] = len(bins)
+                bins.append(sys.intern(b))
+                hits.append(int(hit.hits[i]) * scale)
+                if excl is not None:
+                    excl.append(hit.excl[i] * scale if flags else 0)
+                    unreachable.append(hit.unreachable[i] * scale if flags else 0)
+        mine.bins = bins
+        mine.hits = int_array(hits)
+        mine.excl = excl
+        mine.unreachable = unreachable
+
+    def get_missed_cg_cp(self):
+        for exprname, hit in self.cp_hit_data.items():
+            if hit.type == CP_USER:
+                missed = [name for name, data, excl in zip(hit.bins, hit.hits, hit.excl) if data == 0 and not excl]
+            else:
+                missed = missed_compact(hit.hits, hit.bins)
+            self.missed_cg_cp[exprname] = CompactBins(missed, hit.type)
 
-            pass
-    
     def print_missed_cg_cp(self):
         print("missed_cg_cp:")
         for key in self.missed_cg_cp:
@@ -82,19 +481,104 @@ class vcs_cg(object):
                 pass
 
     def get_missed_cg_cc(self):
-        # 查找cg_src节点
-        cg_src = self.root.find('.//cg_src')
+        for name, hit in self.cc_hit_data.items():
+            labels = [self.cp_hit_data[exprname].bins for exprname in hit.cps]
+            covered = [code for code, n in hit.hits.items() if n > 0]
+            self.missed_cg_cc[name] = CrossHoles(labels, covered)
 
-        # 解析覆盖结果
-        cg_covdef = cg_src.find('./cg_covdef')
-        for cc in cg_covdef.findall('./cc'):
-            for cn_nt_s in cc.findall('./covered_auto_crosses/cn_nt_s'):
-                val = cn_nt_s.get('val') # 交叉1值
-                cn_nt_s_d = cn_nt_s.find('./cn_t_s_d')
-            # self.cg_result_cc[cp_id].append({'data':data})
+    def print_missed_cg_cc(self):
+        print("missed_cg_cc:")
+        for key in self.missed_cg_cc:
+            for val in self.missed_cg_cc[key]:
+                print(f"key:{key},val:<{', '.join(val['val'])}>,type:{val['type']}")
+
+def find_tests(vdb):
+    # regression下每个test一个目录：simv.vdb/snps/coverage/db/testdata/<test>/testbench.cumulative.xml
+    return sorted(glob.glob(os.path.join(vdb, 'snps', 'coverage', 'db', 'testdata', '*', '*.cumulative.xml')))
+
+def _store(cache, files, cg):
+    try:
+        cache.store(files, cg)
+    except OverflowError:
+        # 交叉编码超出int64时不缓存
+        pass
+
+def parse_cached(file, cache=None, stream=True):
+    # 优先从缓存加载解析结果，未命中时解析并写入缓存
+    cg = vcs_cg()
+    if cache is not None:
+        with perf.phase('vcs_cg.cache_load', file=file) as p:
+            hit = cache.load(file, cg)
+            p.count('cache_hits' if hit else 'cache_misses')
+        if hit:
+            return cg
+    cg.parse(file, stream=stream)
+    if cache is not None:
+        _store(cache, file, cg)
+    return cg
+
+def _merge_files(files, cache=None):
+    cg = vcs_cg()
+    for file in files:
+        cg.merge(parse_cached(file, cache))
+    return cg
+
+def merge(vdb, workers=None, cache=None):
+    # 多进程解析regression下所有test的xml，并把各bin命中次数合并为一份
+    files = find_tests(vdb)
+    if not files:
+        raise Exception('No test xml found in:' + vdb)
+
+    # 所有test都没变化时直接加载上次的合并结果
+    cg = vcs_cg()
+    if cache is not None and cache.load(files, cg):
+        perf.count('cache_hits')
+        return cg
+
+    workers = workers or os.cpu_count() or 1
+    with perf.phase('vcs_cg.merge', vdb=vdb, tests=len(files), workers=workers) as p:
+        if workers == 1 or len(files) == 1:
+            cg = _merge_files(files, cache)
+        else:
+            # 每个进程先在本地合并一批test，减少进程间传输的数据量
+            n_chunks = min(len(files), workers * 4)
+            chunks = [files[i::n_chunks] for i in range(n_chunks)]
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                for part in pool.map(partial(_merge_files, cache=cache), chunks):
+                    cg.merge(part)
+        if perf.enabled:
+            p.count('merged_bins', cg.n_bins())
+
+    if cache is not None:
+        _store(cache, files, cg)
+    return cg
+
+if __name__ == '__main__':
+    import argparse
+    parser = argparse.ArgumentParser(description="VCS功能覆盖率漏洞提取")
+    parser.add_argument('file', nargs='?', default='/code/vcs_example/func_cov/simv.vdb/snps/coverage/db/testdata/test/testbench.cumulative.xml', help='testbench.cumulative.xml路径，或simv.vdb目录(合并所有test)')
+    parser.add_argument('--stream', action='store_true', help='流式解析，适用于超大XML')
+    parser.add_argument('-j', '--workers', type=int, default=None, help='合并时的并行进程数，默认为CPU核数')
+    parser.add_argument('--cache', nargs='?', const=DEFAULT_CACHE_DIR, default=None, help='启用解析结果缓存，可指定缓存目录')
+    parser.add_argument('--cache-size', type=int, default=DEFAULT_MAX_BYTES >> 20, help='缓存目录大小上限(MB)')
+    parser.add_argument('--cache-hash', action='store_true', help='缓存key中加入文件内容hash')
+    perf.add_arguments(parser)
+    args = parser.parse_args()
+    perf.enable_from_args(args)
 
+    cache = None
+    if args.cache:
+        cache = CoverageCache(args.cache, max_bytes=args.cache_size << 20, use_hash=args.cache_hash)
 
-vcs_cg = vcs_cg()
-vcs_cg.parse('/code/vcs_example/func_cov/simv.vdb/snps/coverage/db/testdata/test/testbench.cumulative.xml')
-vcs_cg.get_missed_cg_cp()
-vcs_cg.print_missed_cg_cp()
\ No newline at end of file
+    if os.path.isdir(args.file):
+        cg = merge(args.file, workers=args.workers, cache=cache)
+    elif cache is not None:
+        cg = parse_cached(args.file, cache, stream=args.stream)
+    else:
+        cg = vcs_cg()
+        cg.parse(args.file, stream=args.stream)
+    with perf.phase('vcs_cg.missed'):
+        cg.get_missed_cg_cp()
+        cg.get_missed_cg_cc()
+    cg.print_missed_cg_cp()
+    cg.print_missed_cg_cc()